@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import ACCOUNT_CACHE_TTL, ACCOUNT_CACHE_SIZE
+
+ACCOUNT_QUERY = """
+    SELECT accounts.id, casinos.name, casinos.website, accounts.username,
+           accounts.next_reminder, accounts.auto_claim
+    FROM accounts
+    JOIN casinos ON accounts.casino_id = casinos.id
+"""
+
+class AccountRecord:
+    """One accounts JOIN casinos row.
+
+    Supports account['field'] lookups so claim handlers can keep treating
+    accounts like the dicts get_account used to return.
+    """
+    __slots__ = ('id', 'casino_name', 'website', 'username', 'next_reminder', 'auto_claim')
+
+    def __init__(self, id, casino_name, website, username, next_reminder, auto_claim):
+        self.id = id
+        self.casino_name = casino_name
+        self.website = website
+        self.username = username
+        self.next_reminder = next_reminder
+        self.auto_claim = auto_claim
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+class AccountCache:
+    """Pre-joined account lookups for the claim path.
+
+    load_all() fetches every account with its casino in one query for bulk
+    sweeps. get() serves single-account lookups from a small LRU whose
+    entries expire after ttl seconds; invalidate() drops everything and is
+    registered with database.on_accounts_changed by CoinClaimer.
+    """
+
+    def __init__(self, ttl=ACCOUNT_CACHE_TTL, max_size=ACCOUNT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load_all(self, conn):
+        """Return {account_id: AccountRecord} for every account"""
+        return {row[0]: AccountRecord(*row) for row in conn.execute(ACCOUNT_QUERY)}
+
+    def get(self, conn, account_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(account_id)
+                return entry[0]
+
+        row = conn.execute(ACCOUNT_QUERY + " WHERE accounts.id = ?", (account_id,)).fetchone()
+        record = AccountRecord(*row) if row else None
+        if record:
+            with self._lock:
+                self._entries[account_id] = (record, now + self.ttl)
+                self._entries.move_to_end(account_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
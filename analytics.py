@@ -1,99 +1,187 @@
-import sqlite3
 from datetime import datetime, timedelta
+from db_pool import SQLitePool, EnginePool
+from rollups import BOT_TABLES, APP_TABLES
 
-class Analytics:
-    def __init__(self, db_path='sweeper_keeper.db'):
-        self.db_path = db_path
-
-    def _get_db_connection(self):
-        return sqlite3.connect(self.db_path)
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-    def get_total_coins_claimed(self, user_id, time_range=None):
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-        SELECT SUM(cc.amount)
-        FROM coin_claims cc
-        JOIN accounts a ON cc.account_id = a.id
-        WHERE a.user_id = ?
-        """
-        params = [user_id]
+# Windowed totals shown on the /analytics dashboard
+DASHBOARD_WINDOWS = {
+    'last_24h_coins': timedelta(hours=24),
+    'last_7d_coins': timedelta(days=7),
+    'last_30d_coins': timedelta(days=30),
+}
 
-        if time_range:
-            query += " AND cc.claim_time >= ?"
-            params.append((datetime.now() - time_range).strftime('%Y-%m-%d %H:%M:%S'))
+class Analytics:
+    """Claim metrics per user.
+
+    Time-range totals come from the rollup tables maintained by rollups.py: a
+    window [since, now] is answered from raw claims up to the first full hour,
+    hourly rollups up to the first full day and daily rollups after that.
+    Only the partial hour at the start of a window touches coin_claims.
+    """
+
+    def __init__(self, db_path='sweeper_keeper.db', engine=None):
+        if engine is not None:
+            self.pool = EnginePool(engine)
+            self.tables = APP_TABLES
+        else:
+            self.pool = SQLitePool(db_path)
+            self.tables = BOT_TABLES
+
+    def _query(self, sql, params):
+        return self.pool.execute(sql.format(**self.tables), params)
+
+    def _window_params(self, windows):
+        """Bind the since / first full hour / first full day of every window"""
+        params = {}
+        for name, time_range in windows.items():
+            since = datetime.now() - time_range
+            hour = since.replace(minute=0, second=0, microsecond=0)
+            if hour < since:
+                hour += timedelta(hours=1)
+            day = hour.replace(hour=0)
+            if day < hour:
+                day += timedelta(days=1)
+            params[f'{name}_since'] = since.strftime(TIME_FORMAT)
+            params[f'{name}_hour'] = hour.strftime(TIME_FORMAT)
+            params[f'{name}_day'] = day.strftime('%Y-%m-%d')
+            params[f'{name}_day_start'] = day.strftime(TIME_FORMAT)
+        return params
+
+    def _window_columns(self, windows, condition, measures):
+        return ''.join(
+            f",\n            SUM(CASE WHEN {condition.format(w=name)} THEN {measure} ELSE 0 END)"
+            for name in windows for measure in measures)
+
+    def _window_sums(self, row, windows, offset):
+        """{window: [amount, successful_claims, total_attempts]} from a row of _window_columns"""
+        return {name: [row[offset + 3 * index + measure] or 0 for measure in range(3)]
+                for index, name in enumerate(windows)}
+
+    def _rollup_totals(self, user_id, windows):
+        """Per-casino all-time rows (name, amount, successful, attempts, {window sums}) and
+        {window: [amount, successful_claims, total_attempts]} across all casinos"""
+        params = {'user_id': user_id}
+        params.update(self._window_params(windows))
+
+        daily_columns = self._window_columns(
+            windows, "r.day >= :{w}_day", ['r.total_amount', 'r.successful_claims', 'r.total_attempts'])
+        casinos = []
+        for row in self._query(f"""
+        SELECT c.name, SUM(r.total_amount), SUM(r.successful_claims), SUM(r.total_attempts){daily_columns}
+        FROM {{rollup_daily}} r
+        LEFT JOIN {{casinos}} c ON r.casino_id = c.id
+        WHERE r.user_id = :user_id
+        GROUP BY c.name
+        """, params):
+            casinos.append((row[0], row[1] or 0, row[2] or 0, row[3] or 0, self._window_sums(row, windows, 4)))
+
+        totals = {name: [0, 0, 0] for name in windows}
+        for casino in casinos:
+            for name, sums in casino[4].items():
+                totals[name] = [total + value for total, value in zip(totals[name], sums)]
+        if not windows:
+            return casinos, totals
+
+        params['min_hour'] = min(params[f'{name}_hour'] for name in windows)
+        params['min_since'] = min(params[f'{name}_since'] for name in windows)
+        params['max_hour'] = max(params[f'{name}_hour'] for name in windows)
+
+        hourly_columns = self._window_columns(
+            windows, "r.hour >= :{w}_hour AND r.hour < :{w}_day_start",
+            ['r.total_amount', 'r.successful_claims', 'r.total_attempts'])
+        hourly = self._query(f"""
+        SELECT COUNT(*){hourly_columns}
+        FROM {{rollup_hourly}} r
+        WHERE r.user_id = :user_id AND r.hour >= :min_hour
+        """, params)[0]
+
+        raw_columns = self._window_columns(
+            windows, "cc.claim_time >= :{w}_since AND cc.claim_time < :{w}_hour",
+            ['cc.amount', 'CASE WHEN cc.amount > 0 THEN 1 ELSE 0 END', '1'])
+        raw = self._query(f"""
+        SELECT COUNT(*){raw_columns}
+        FROM {{coin_claims}} cc
+        JOIN {{accounts}} a ON cc.account_id = a.id
+        WHERE a.user_id = :user_id AND cc.claim_time >= :min_since AND cc.claim_time < :max_hour
+        """, params)[0]
+
+        for partial in (self._window_sums(hourly, windows, 1), self._window_sums(raw, windows, 1)):
+            for name, sums in partial.items():
+                totals[name] = [total + value for total, value in zip(totals[name], sums)]
+        return casinos, totals
 
-        cursor.execute(query, params)
-        result = cursor.fetchone()[0]
-        conn.close()
-        return result or 0
+    def get_total_coins_claimed(self, user_id, time_range=None):
+        if not time_range:
+            casinos, _ = self._rollup_totals(user_id, {})
+            return sum(casino[1] for casino in casinos)
+        _, totals = self._rollup_totals(user_id, {'window': time_range})
+        return totals['window'][0]
 
     def get_claim_success_rate(self, user_id, time_range=None):
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            COUNT(CASE WHEN cc.amount > 0 THEN 1 END) as successful_claims,
-            COUNT(*) as total_attempts
-        FROM coin_claims cc
-        JOIN accounts a ON cc.account_id = a.id
-        WHERE a.user_id = ?
-        """
-        params = [user_id]
-
-        if time_range:
-            query += " AND cc.claim_time >= ?"
-            params.append((datetime.now() - time_range).strftime('%Y-%m-%d %H:%M:%S'))
-
-        cursor.execute(query, params)
-        successful_claims, total_attempts = cursor.fetchone()
-        conn.close()
+        if not time_range:
+            casinos, _ = self._rollup_totals(user_id, {})
+            successful_claims = sum(casino[2] for casino in casinos)
+            total_attempts = sum(casino[3] for casino in casinos)
+        else:
+            _, totals = self._rollup_totals(user_id, {'window': time_range})
+            _, successful_claims, total_attempts = totals['window']
 
         if total_attempts > 0:
             return (successful_claims / total_attempts) * 100
         return 0
 
     def get_coins_claimed_by_casino(self, user_id, time_range=None):
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-        SELECT c.name, SUM(cc.amount)
-        FROM coin_claims cc
-        JOIN accounts a ON cc.account_id = a.id
-        JOIN casinos c ON a.casino_id = c.id
-        WHERE a.user_id = ?
+        if not time_range:
+            casinos, _ = self._rollup_totals(user_id, {})
+            return [(casino[0], casino[1]) for casino in casinos if casino[0] is not None]
+
+        # Hourly rollups are not split by casino, so the partial first day comes from raw claims
+        casinos, _ = self._rollup_totals(user_id, {'window': time_range})
+        by_casino = {casino[0]: casino[4]['window'] for casino in casinos}
+        params = {'user_id': user_id}
+        params.update(self._window_params({'window': time_range}))
+        for name, amount, attempts in self._query("""
+        SELECT c.name, SUM(cc.amount), COUNT(*)
+        FROM {coin_claims} cc
+        JOIN {accounts} a ON cc.account_id = a.id
+        JOIN {casinos} c ON a.casino_id = c.id
+        WHERE a.user_id = :user_id AND cc.claim_time >= :window_since AND cc.claim_time < :window_day_start
+        GROUP BY c.name
+        """, params):
+            sums = by_casino.setdefault(name, [0, 0, 0])
+            sums[0] += amount or 0
+            sums[2] += attempts
+        return [(name, sums[0]) for name, sums in by_casino.items() if name is not None and sums[2] > 0]
+
+    def get_dashboard_summary(self, user_id, windows=DASHBOARD_WINDOWS):
+        """All-time and windowed totals, success rate and per-casino sums.
+
+        Returns a dict with total_coins, success_rate, coins_by_casino and one
+        entry per key of windows.
         """
-        params = [user_id]
-
-        if time_range:
-            query += " AND cc.claim_time >= ?"
-            params.append((datetime.now() - time_range).strftime('%Y-%m-%d %H:%M:%S'))
-
-        query += " GROUP BY c.name"
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        casinos, totals = self._rollup_totals(user_id, windows)
+
+        successful_claims = sum(casino[2] for casino in casinos)
+        total_attempts = sum(casino[3] for casino in casinos)
+        summary = {
+            'total_coins': sum(casino[1] for casino in casinos),
+            'success_rate': (successful_claims / total_attempts) * 100 if total_attempts > 0 else 0,
+            'coins_by_casino': [(casino[0], casino[1]) for casino in casinos if casino[0] is not None],
+        }
+        for name in windows:
+            summary[name] = totals[name][0]
+        return summary
 
     def get_claim_history(self, user_id, limit=10):
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-
         query = """
         SELECT c.name, a.username, cc.claim_time, cc.amount
-        FROM coin_claims cc
-        JOIN accounts a ON cc.account_id = a.id
-        JOIN casinos c ON a.casino_id = c.id
-        WHERE a.user_id = ?
+        FROM {coin_claims} cc
+        JOIN {accounts} a ON cc.account_id = a.id
+        JOIN {casinos} c ON a.casino_id = c.id
+        WHERE a.user_id = :user_id
         ORDER BY cc.claim_time DESC
-        LIMIT ?
+        LIMIT :limit
         """
 
-        cursor.execute(query, (user_id, limit))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        return self._query(query, {'user_id': user_id, 'limit': limit})
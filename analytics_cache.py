@@ -0,0 +1,151 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from database import thread_local_connection
+from config import ANALYTICS_CACHE_TTL, ANALYTICS_CACHE_SIZE
+
+class SharedCacheStore:
+    """SQLite file shared by every worker process on the host.
+
+    Each user has a generation number; invalidating a user bumps it, which
+    makes every worker's local copies for that user stale at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._get_db = thread_local_connection(self.path)
+        conn = self._get_db()
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                generation INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                value BLOB NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_generations (
+                user_id INTEGER PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def generation(self, user_id):
+        row = self._get_db().execute(
+            'SELECT generation FROM cache_generations WHERE user_id = ?', (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key, generation):
+        row = self._get_db().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ? AND generation = ? AND expires_at > ?',
+            (key, generation, time.time())).fetchone()
+        if row:
+            return pickle.loads(row[0]), row[1]
+        return None
+
+    def set(self, key, user_id, generation, expires_at, value):
+        conn = self._get_db()
+        conn.execute('''
+            INSERT OR REPLACE INTO cache_entries (key, user_id, generation, expires_at, value)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, user_id, generation, expires_at, pickle.dumps(value)))
+        conn.commit()
+
+    def invalidate_user(self, user_id):
+        conn = self._get_db()
+        with conn:
+            conn.execute('''
+                INSERT INTO cache_generations (user_id, generation) VALUES (?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+            ''', (user_id,))
+            conn.execute('DELETE FROM cache_entries WHERE user_id = ?', (user_id,))
+
+class CachedAnalytics:
+    """Analytics with a per-(user_id, metric, window) result cache.
+
+    Entries live for ttl seconds in a bounded in-process LRU and are dropped
+    early by invalidate_user(), which the app calls whenever it records a
+    claim. With shared_path set, results and invalidations also go through a
+    SharedCacheStore so worker processes share one warm cache.
+    """
+
+    def __init__(self, analytics, ttl=ANALYTICS_CACHE_TTL, max_entries=ANALYTICS_CACHE_SIZE, shared_path=None):
+        self.analytics = analytics
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = SharedCacheStore(shared_path) if shared_path else None
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id):
+        if self.shared:
+            return self.shared.generation(user_id)
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def _window_key(self, window):
+        if hasattr(window, 'total_seconds'):
+            return window.total_seconds()
+        return window
+
+    def _cached(self, user_id, metric, window, compute):
+        key = (user_id, metric, self._window_key(window))
+        generation = self._generation(user_id)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now and entry[2] == generation:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        shared_key = repr(key)
+        found = self.shared.get(shared_key, generation) if self.shared else None
+        if found:
+            value, expires_at = found
+        else:
+            value = compute()
+            expires_at = now + self.ttl
+            if self.shared:
+                self.shared.set(shared_key, user_id, generation, expires_at, value)
+
+        with self._lock:
+            self._entries[key] = (value, expires_at, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+        if self.shared:
+            self.shared.invalidate_user(user_id)
+
+    def get_total_coins_claimed(self, user_id, time_range=None):
+        return self._cached(user_id, 'total_coins', time_range,
+                            lambda: self.analytics.get_total_coins_claimed(user_id, time_range))
+
+    def get_claim_success_rate(self, user_id, time_range=None):
+        return self._cached(user_id, 'success_rate', time_range,
+                            lambda: self.analytics.get_claim_success_rate(user_id, time_range))
+
+    def get_coins_claimed_by_casino(self, user_id, time_range=None):
+        return self._cached(user_id, 'coins_by_casino', time_range,
+                            lambda: self.analytics.get_coins_claimed_by_casino(user_id, time_range))
+
+    def get_dashboard_summary(self, user_id):
+        return self._cached(user_id, 'dashboard_summary', None,
+                            lambda: self.analytics.get_dashboard_summary(user_id))
+
+    def get_claim_history(self, user_id, limit=10):
+        return self._cached(user_id, 'claim_history', limit,
+                            lambda: self.analytics.get_claim_history(user_id, limit))
@@ -9,12 +9,17 @@ import os
 import logging
 from coin_claimer import CoinClaimer
 from analytics import Analytics
-from datetime import timedelta
+from analytics_cache import CachedAnalytics
+from dashboard import load_dashboard
+from instrumentation import Metrics, instrument_app
+import db_resilience
+from config import METRICS_PATH, ANALYTICS_CACHE_PATH, CLAIM_AMOUNT
 from flask_migrate import Migrate
-from models import db, User, Casino, Account
+from models import db, User, Casino, Account, CoinClaim
+from rollups import APP_TABLES, record_claims, sqlalchemy_executor
+from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
-from time import sleep
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -40,6 +45,14 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True,
 }
 
+# SMTP server for notification digests (notifications.DigestSender)
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'localhost')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 25))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes')
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER')
+
 db.init_app(app)
 migrate = Migrate(app, db)
 
@@ -47,21 +60,26 @@ login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
 coin_claimer = CoinClaimer()
-analytics = Analytics()
 
-def retry_db_operation(operation, max_retries=3, delay=1):
-    last_error = None
-    for attempt in range(max_retries):
-        try:
-            return operation()
-        except OperationalError as e:
-            last_error = e
-            if "SSL connection has been closed" in str(e):
-                logger.warning(f"SSL connection error on attempt {attempt + 1}/{max_retries}, retrying...")
-                sleep(delay * (2 ** attempt))
-            else:
-                raise
-    raise last_error
+# Analytics reads the app's own database (Postgres when DATABASE_URL is set).
+# Cached results and per-user invalidations go through ANALYTICS_CACHE_PATH (or
+# the env override), so a claim handled by one LoadBalancer worker clears the
+# stale totals in all of them; set it to an empty string to cache per process.
+with app.app_context():
+    analytics = CachedAnalytics(Analytics(engine=db.engine),
+                                shared_path=os.environ.get('ANALYTICS_CACHE_PATH', ANALYTICS_CACHE_PATH))
+
+# Latency, query and retry metrics, served on /metrics. METRICS_PATH (or the
+# env override) is the file LoadBalancer workers aggregate through.
+metrics = Metrics(shared_path=os.environ.get('METRICS_PATH', METRICS_PATH))
+with app.app_context():
+    instrument_app(app, metrics, db.engine)
+    db_resilience.install(db.engine)
+
+db_retry = db_resilience.DBRetryPolicy(db.session, metrics)
+
+def retry_db_operation(operation):
+    return db_retry.run(operation)
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -183,14 +201,15 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+
     def get_user_data():
-        casinos = Casino.query.filter_by(user_id=current_user.id).all()
-        accounts = Account.query.filter_by(user_id=current_user.id).all()
-        return casinos, accounts
+        return load_dashboard(current_user.id, after=after, before=before)
     
     try:
-        casinos, accounts = retry_db_operation(get_user_data)
-        return render_template('dashboard.html', casinos=casinos, accounts=accounts)
+        page = retry_db_operation(get_user_data)
+        return render_template('dashboard.html', casinos=page.casinos, accounts=page.accounts, page=page)
     except OperationalError:
         flash('Unable to load dashboard data. Please try again.', 'danger')
         return redirect(url_for('index'))
@@ -245,47 +264,55 @@ def add_account():
 @app.route('/claim_coins/<int:account_id>')
 @login_required
 def claim_coins(account_id):
-    def process_claim():
-        account = Account.query.get_or_404(account_id)
-        if account.user_id != current_user.id:
-            return jsonify({"success": False, "message": "Unauthorized"}), 403
-        
-        success = coin_claimer.claim_coins(account_id)
-        if success:
-            account.coins += 100
-            db.session.commit()
-            return jsonify({"success": True, "message": "Coins claimed successfully"})
-        return jsonify({"success": False, "message": "Failed to claim coins"}), 500
-    
+    def get_account():
+        return Account.query.get_or_404(account_id)
+
     try:
-        return retry_db_operation(process_claim)
+        account = retry_db_operation(get_account)
     except OperationalError:
         return jsonify({"success": False, "message": "Database error occurred"}), 500
+    if account.user_id != current_user.id:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+    user_id = account.user_id
+
+    # The casino claim runs exactly once; only the bookkeeping below is retried,
+    # so a database error can never repeat a claim that already went through
+    started = datetime.now()
+    success = coin_claimer.claim_coins(account_id)
+    claim_time = datetime.now()
+    metrics.observe('claim_duration_seconds', (('result', 'success' if success else 'failure'),),
+                    (claim_time - started).total_seconds())
+    amount = CLAIM_AMOUNT if success else 0
+
+    def record_claim():
+        db.session.add(CoinClaim(account_id=account_id, claim_time=claim_time, amount=amount))
+        record_claims(sqlalchemy_executor(db.session), APP_TABLES, db.engine.dialect.name,
+                      [(account_id, claim_time, amount)])
+        if success:
+            claimed = db.session.get(Account, account_id)
+            claimed.coins = (claimed.coins or 0) + CLAIM_AMOUNT
+        db.session.commit()
+
+    try:
+        retry_db_operation(record_claim)
+    except OperationalError:
+        return jsonify({"success": success, "message": "Database error occurred"}), 500
+    analytics.invalidate_user(user_id)
+    if success:
+        return jsonify({"success": True, "message": "Coins claimed successfully"})
+    return jsonify({"success": False, "message": "Failed to claim coins"}), 500
 
 @app.route('/analytics')
 @login_required
 def analytics_dashboard():
     def get_analytics_data():
-        total_coins = analytics.get_total_coins_claimed(current_user.id)
-        success_rate = analytics.get_claim_success_rate(current_user.id)
-        coins_by_casino = analytics.get_coins_claimed_by_casino(current_user.id)
+        summary = analytics.get_dashboard_summary(current_user.id)
         claim_history = analytics.get_claim_history(current_user.id)
-        last_24h_coins = analytics.get_total_coins_claimed(current_user.id, timedelta(hours=24))
-        last_7d_coins = analytics.get_total_coins_claimed(current_user.id, timedelta(days=7))
-        last_30d_coins = analytics.get_total_coins_claimed(current_user.id, timedelta(days=30))
-        return (total_coins, success_rate, coins_by_casino, claim_history,
-                last_24h_coins, last_7d_coins, last_30d_coins)
+        return summary, claim_history
     
     try:
-        analytics_data = retry_db_operation(get_analytics_data)
-        return render_template('analytics.html',
-                            total_coins=analytics_data[0],
-                            success_rate=analytics_data[1],
-                            coins_by_casino=analytics_data[2],
-                            claim_history=analytics_data[3],
-                            last_24h_coins=analytics_data[4],
-                            last_7d_coins=analytics_data[5],
-                            last_30d_coins=analytics_data[6])
+        summary, claim_history = retry_db_operation(get_analytics_data)
+        return render_template('analytics.html', claim_history=claim_history, **summary)
     except OperationalError:
         flash('Unable to load analytics data. Please try again.', 'danger')
         return redirect(url_for('dashboard'))
@@ -296,7 +323,7 @@ if __name__ == '__main__':
     
     if os.environ.get('FLASK_ENV') == 'production':
         from load_balancer import LoadBalancer
-        load_balancer = LoadBalancer(app)
+        load_balancer = LoadBalancer(app, on_worker_exit=lambda: metrics.flush(force=True))
         load_balancer.start()
     else:
         app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+import aiohttp
+from yarl import URL
+
+from coin_claimer import CLAIM_PAGES, TRANSIENT_STATUS_CODES, TransientClaimError, ClaimOutcomeUnknown
+from circuit_breaker import call_with_retries_async
+from page_inspector import get_page_inspector
+from config import ASYNC_MAX_CONCURRENCY, ASYNC_CONNECTIONS_PER_HOST, CLAIM_REQUEST_TIMEOUT
+
+# aiohttp counterpart of coin_claimer.TRANSIENT_ERRORS: retried with backoff
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, TransientClaimError)
+
+def check_transient(response):
+    """aiohttp counterpart of coin_claimer.check_transient"""
+    if response.status in TRANSIENT_STATUS_CODES:
+        raise TransientClaimError(f"HTTP {response.status} from {response.url}")
+    return response
+
+def restore_cookie_jar(jar, cookies, host):
+    """Load cookies cached by AuthSessionCache into an aiohttp cookie jar"""
+    for cookie in cookies:
+        morsels = SimpleCookie()
+        morsels[cookie["name"]] = cookie["value"]
+        morsel = morsels[cookie["name"]]
+        if cookie["domain"]:
+            morsel["domain"] = cookie["domain"]
+        morsel["path"] = cookie["path"] or "/"
+        if cookie["secure"]:
+            morsel["secure"] = True
+        jar.update_cookies(morsels, response_url=URL(f"https://{host}/"))
+
+def jar_cookies(jar):
+    """The cookies in an aiohttp cookie jar in the form AuthSessionCache stores"""
+    # The jar drops expired cookies itself; the cache entry falls back to its TTL
+    return [{
+        "name": morsel.key,
+        "value": morsel.value,
+        "domain": morsel["domain"],
+        "path": morsel["path"] or "/",
+        "secure": bool(morsel["secure"]),
+        "expires": None,
+    } for morsel in jar]
+
+class AsyncClaimEngine:
+    """asyncio backend for CoinClaimer.claim_coins_for_all_accounts.
+
+    Every claim runs as a task on one event loop under a global semaphore.
+    Per casino it goes through the same CasinoLimiter (token bucket and
+    adaptive concurrency), CircuitBreaker, retry policy and login cookie
+    cache as the threaded backend, and each casino host gets one shared
+    connection pool. Every account still gets its own cookie jar so logins
+    never leak between accounts.
+    """
+
+    def __init__(self, coin_claimer, max_concurrency=ASYNC_MAX_CONCURRENCY,
+                 connections_per_host=ASYNC_CONNECTIONS_PER_HOST, request_timeout=CLAIM_REQUEST_TIMEOUT):
+        self.coin_claimer = coin_claimer
+        self.max_concurrency = max_concurrency
+        self.connections_per_host = connections_per_host
+        self.request_timeout = request_timeout
+        self.page_inspector = get_page_inspector()
+
+    def run(self, accounts):
+        """Claim coins for every account record and return [(account_id, success)]"""
+        return asyncio.run(self.claim_all(accounts))
+
+    async def claim_all(self, accounts):
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._connectors = {}
+        try:
+            return await asyncio.gather(*(self._claim_account(account) for account in accounts))
+        finally:
+            for connector in self._connectors.values():
+                await connector.close()
+
+    def _breaker(self, account):
+        """The casino's CircuitBreaker, shared with the threaded backend"""
+        return self.coin_claimer.circuit_breakers.get(account['casino_name'])
+
+    def _limiter(self, account):
+        """The casino's CasinoLimiter, shared with the threaded backend"""
+        return self.coin_claimer.casino_limiters.get(account['casino_name'])
+
+    def _connector(self, host):
+        if host not in self._connectors:
+            self._connectors[host] = aiohttp.TCPConnector(limit_per_host=self.connections_per_host)
+        return self._connectors[host]
+
+    async def _claim_account(self, account):
+        account_id = account['id']
+        breaker = self._breaker(account)
+        try:
+            claim_page = CLAIM_PAGES.get(account['casino_name'])
+            limiter = self._limiter(account)
+            if not claim_page or not limiter:
+                logging.error(f"No handler found for casino: {account['casino_name']}")
+                return account_id, False
+
+            async with self._global_limit:
+                result = await limiter.call_async(self._call_claim, account, claim_page)
+            if result is None:
+                return account_id, False
+            self.coin_claimer.record_claim_result(account_id, result)
+            logging.info(f"Coin claiming for account {account_id} completed with result: {result}")
+            return account_id, result
+        except Exception as exc:
+            if breaker:
+                breaker.record_failure()
+            logging.error(f"Account {account_id} generated an exception: {exc}")
+            return account_id, False
+
+    async def _call_claim(self, account, claim_page):
+        """Run the claim, or return None if the casino's circuit is open.
+
+        Called inside the casino's limiter, so claims that were queued behind
+        it see the failures recorded by the claims ahead of them.
+        """
+        breaker = self._breaker(account)
+        if breaker and not breaker.allow():
+            logging.warning(f"Skipping account {account['id']}: circuit for {account['casino_name']} is open")
+            self._limiter(account).mark_skipped()
+            return None
+        return await self._generic_claim(account, **claim_page)
+
+    async def _generic_claim(self, account, claim_url, login_selector, claim_selector):
+        breaker = self._breaker(account)
+        limiter = self._limiter(account)
+        connector = self._connector(urlsplit(claim_url).netloc)
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+
+        async def attempt():
+            try:
+                return await self._attempt_claim(session, account, claim_url, login_selector, claim_selector)
+            except (ClaimOutcomeUnknown,) + TRANSIENT_ERRORS:
+                # Throttled, 5xx or unreachable: shrink the casino's concurrency even if a retry succeeds
+                limiter.mark_congested()
+                raise
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                             timeout=timeout) as session:
+                return await call_with_retries_async(
+                    attempt, TRANSIENT_ERRORS,
+                    description=f"claim for account {account['id']} on {account['casino_name']}")
+
+        except ClaimOutcomeUnknown as e:
+            if breaker:
+                breaker.record_failure()
+            logging.error(f"Claim for account {account['id']} on {account['casino_name']} timed out; not repeating it: {str(e)}")
+            return False
+        except (aiohttp.ClientError,) + TRANSIENT_ERRORS as e:
+            if breaker:
+                breaker.record_failure()
+            logging.error(f"Network error while claiming coins for account {account['id']} on {account['casino_name']}: {str(e)}")
+            return False
+
+    async def _login(self, session, account, claim_url):
+        login_url = f"{account['website']}/login"
+
+        # Simulate login
+        login_data = {"username": account['username'], "password": "placeholder_password"}
+        async with session.post(login_url, data=login_data) as login_response:
+            check_transient(login_response)
+            if login_response.status != 200:
+                logging.error(f"Failed to login for account {account['id']} on {account['casino_name']}")
+                return False
+        self.coin_claimer.auth_cache.store_cookies(account['id'], urlsplit(claim_url).netloc,
+                                                   jar_cookies(session.cookie_jar))
+        return True
+
+    async def _fetch_claim_page(self, session, claim_url, login_selector, claim_selector):
+        """Return the page status and 'claim', 'login' or None for what it shows first"""
+        async with session.get(claim_url) as claim_response:
+            check_transient(claim_response)
+            if claim_response.status in (401, 403):
+                return claim_response.status, 'login'
+            claim_page = await claim_response.text()
+        found = self.page_inspector.find_first(claim_page, [claim_selector, login_selector])
+        state = 'claim' if found == claim_selector else 'login' if found == login_selector else None
+        return claim_response.status, state
+
+    async def _attempt_claim(self, session, account, claim_url, login_selector, claim_selector):
+        """One pass of login, claim page and claim POST; transient errors propagate"""
+        host = urlsplit(claim_url).netloc
+        breaker = self._breaker(account)
+
+        # Reuse cached login cookies and only log in when there are none
+        cookies = self.coin_claimer.auth_cache.load(account['id'], host)
+        if cookies:
+            restore_cookie_jar(session.cookie_jar, cookies, host)
+        elif not await self._login(session, account, claim_url):
+            return False
+
+        # Simulate claiming coins
+        status, page_state = await self._fetch_claim_page(session, claim_url, login_selector, claim_selector)
+        if page_state == 'login':
+            logging.info(f"Session expired for account {account['id']} on {account['casino_name']}, logging in again")
+            self.coin_claimer.auth_cache.discard(account['id'], host)
+            session.cookie_jar.clear()
+            if not await self._login(session, account, claim_url):
+                return False
+            status, page_state = await self._fetch_claim_page(session, claim_url, login_selector, claim_selector)
+
+        # Logged in and served the claim page: the casino is healthy
+        if breaker and 200 <= status < 300:
+            breaker.record_success()
+
+        if page_state != 'claim':
+            logging.warning(f"Claim button not found for account {account['id']} on {account['casino_name']}")
+            return False
+
+        try:
+            async with session.post(claim_url, data={"claim": "true"}) as claim_result:
+                claim_text = await claim_result.text()
+        except asyncio.TimeoutError as e:
+            raise ClaimOutcomeUnknown(str(e))
+        if "Coins claimed successfully" in claim_text:
+            logging.info(f"Successfully claimed coins for account {account['id']} on {account['casino_name']}")
+            return True
+        logging.warning(f"Failed to claim coins for account {account['id']} on {account['casino_name']}")
+        return False
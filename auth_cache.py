@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+
+from database import thread_local_connection
+from config import AUTH_CACHE_PATH, AUTH_CACHE_TTL
+
+class AuthSessionCache:
+    """Persists casino login cookies per (account, host) across runs.
+
+    Entries expire after ttl seconds, or earlier if one of the stored cookies
+    does. hits, misses and expired count load() outcomes.
+    """
+
+    def __init__(self, db_path=AUTH_CACHE_PATH, ttl=AUTH_CACHE_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._get_db = thread_local_connection(self.db_path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        conn = self._get_db()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS auth_sessions (
+                account_id INTEGER NOT NULL,
+                host TEXT NOT NULL,
+                cookies TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (account_id, host)
+            )
+        ''')
+        conn.commit()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def load(self, account_id, host):
+        """Return the cached cookies as a list of dicts, or None"""
+        row = self._get_db().execute(
+            'SELECT cookies, expires_at FROM auth_sessions WHERE account_id = ? AND host = ?',
+            (account_id, host)).fetchone()
+        if not row:
+            self._count('misses')
+            return None
+        if row[1] <= time.time():
+            self._count('expired')
+            self.discard(account_id, host)
+            return None
+        self._count('hits')
+        return json.loads(row[0])
+
+    def store(self, account_id, host, cookie_jar):
+        """Cache the cookies of a requests cookie jar"""
+        self.store_cookies(account_id, host, [{
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": cookie.secure,
+            "expires": cookie.expires,
+        } for cookie in cookie_jar])
+
+    def store_cookies(self, account_id, host, cookies):
+        """Cache cookies given as dicts with name, value, domain, path, secure and expires"""
+        expires_at = time.time() + self.ttl
+        cookie_expiries = [cookie["expires"] for cookie in cookies if cookie["expires"]]
+        if cookie_expiries:
+            expires_at = min(expires_at, min(cookie_expiries))
+
+        conn = self._get_db()
+        conn.execute('''
+            INSERT OR REPLACE INTO auth_sessions (account_id, host, cookies, expires_at)
+            VALUES (?, ?, ?, ?)
+        ''', (account_id, host, json.dumps(cookies), expires_at))
+        conn.commit()
+
+    def discard(self, account_id, host):
+        conn = self._get_db()
+        conn.execute('DELETE FROM auth_sessions WHERE account_id = ? AND host = ?', (account_id, host))
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "expired": self.expired}
+
+def restore_cookies(session, cookies):
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"],
+                            path=cookie["path"], secure=cookie["secure"], expires=cookie["expires"])
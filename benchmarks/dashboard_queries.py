@@ -0,0 +1,110 @@
+"""Statement count and latency of the /dashboard page as a user's account list grows.
+
+Usage: python benchmarks/dashboard_queries.py [accounts ...]
+
+Seeds a temporary app database with one user owning the given number of
+accounts spread over ten casinos, then requests /dashboard through the
+Flask test client. "lazy" mirrors the old loader (all casinos, all
+accounts, one lazy casino load per account in the template) and "paged"
+is dashboard.load_dashboard. The paged page must issue the same number of
+statements at every size; the script exits non-zero if it does not, so it
+doubles as the query-count regression check. It also walks every page via
+the Next links and checks each account shows up exactly once.
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'app.db')}"
+os.environ['METRICS_PATH'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from flask import render_template
+from sqlalchemy import event
+
+import app as webapp
+from models import db, User, Casino, Account
+from config import DASHBOARD_PAGE_SIZE
+
+CASINOS = 10
+
+def seed(accounts):
+    db.drop_all()
+    db.create_all()
+    user = User(username="bench", email="bench@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    casinos = [Casino(name=f"Casino {i}", website=f"https://casino{i}.example", user_id=user.id)
+               for i in range(CASINOS)]
+    db.session.add_all(casinos)
+    db.session.flush()
+    db.session.add_all([Account(username=f"acct{i}", casino_id=casinos[i % CASINOS].id, user_id=user.id)
+                        for i in range(accounts)])
+    db.session.commit()
+    return user.id
+
+def lazy_dashboard():
+    """The loader /dashboard used before keyset pagination"""
+    from flask_login import current_user
+    casinos = Casino.query.filter_by(user_id=current_user.id).all()
+    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    return render_template('dashboard.html', casinos=casinos, accounts=accounts, page=None)
+
+def fetch(client, url, queries):
+    before = queries[0]
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, f"{url} returned {response.status_code}"
+    return response.get_data(as_text=True), queries[0] - before, elapsed
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    logging.disable(logging.WARNING)
+    flask_app = webapp.app
+    flask_app.config['WTF_CSRF_ENABLED'] = False
+    flask_app.add_url_rule('/dashboard_lazy', 'dashboard_lazy', webapp.login_required(lazy_dashboard))
+
+    print(f"{'accounts':>8} {'mode':>6} {'queries':>8} {'ms':>8}")
+    paged_counts = set()
+    queries = [0]
+    def count(*_):
+        queries[0] += 1
+    with flask_app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+
+    for size in sizes:
+        # Requests run outside this app context so each gets its own session and g
+        with flask_app.app_context():
+            user_id = seed(size)
+        client = flask_app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+
+        for mode, url in (("lazy", '/dashboard_lazy'), ("paged", '/dashboard')):
+            fetch(client, url, queries)  # warm up templates and the statement cache
+            _, statements, elapsed = fetch(client, url, queries)
+            print(f"{size:>8} {mode:>6} {statements:>8} {elapsed * 1000:>8.1f}")
+            if mode == "paged":
+                paged_counts.add(statements)
+
+        seen = []
+        url = '/dashboard'
+        while url:
+            body, statements, _ = fetch(client, url, queries)
+            paged_counts.add(statements)
+            seen += re.findall(r'claim_coins/(\d+)', body)
+            cursor = re.search(r'after=(\d+)', body)
+            url = f'/dashboard?after={cursor.group(1)}' if cursor else None
+        assert len(seen) == len(set(seen)) == size, f"paging returned {len(seen)} rows for {size} accounts"
+
+    print(f"page size {DASHBOARD_PAGE_SIZE}; statements per paged request: {sorted(paged_counts)}")
+    if len(paged_counts) != 1:
+        sys.exit("dashboard statement count depends on the number of accounts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Throughput of the pre-fork LoadBalancer as workers are added.
+
+Usage: python benchmarks/load_balancer.py [seconds] [max_workers]
+
+Serves a CPU-bound WSGI app (about 1ms of hashing per request) through
+LoadBalancer with 1, 2, 4 ... max_workers workers (default: CPU count) and
+drives it with one keep-alive client process per worker plus one. Scaling
+should be close to linear up to the number of cores. The last run sends
+SIGHUP halfway through and reports failed requests across the rolling
+restart, and uses a low max_requests so workers also recycle under load.
+Draining workers answer with Connection: close and old workers are only
+retired once their replacement accepts, so this should report 0 failures.
+"""
+import hashlib
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def cpu_bound_app(environ, start_response):
+    digest = b"sweeper"
+    for _ in range(2000):
+        digest = hashlib.sha256(digest).digest()
+    body = digest.hex().encode()
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+def serve(port, workers, max_requests):
+    from load_balancer import LoadBalancer
+    import logging
+    logging.getLogger('load_balancer').setLevel(logging.WARNING)
+    balancer = LoadBalancer(cpu_bound_app, host='127.0.0.1', port=port, workers=workers,
+                            max_requests=max_requests, max_requests_jitter=max_requests // 10,
+                            graceful_timeout=5, stats_port=None)
+    # Keep the worker count fixed for the measurement
+    balancer._adjust_workers = lambda: None
+    balancer.start()
+
+def client(port, seconds, results):
+    ok = failed = 0
+    deadline = time.monotonic() + seconds
+    conn = None
+    while time.monotonic() < deadline:
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('GET', '/')
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                failed += 1
+            if response.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            # A recycled worker closed our keep-alive connection; reconnect
+            failed += 1
+            conn = None
+    results.put((ok, failed))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, seconds=10):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+def run(workers, seconds, max_requests=0, hup=False):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                               str(port), str(workers), str(max_requests)])
+    try:
+        wait_for_port(port)
+        time.sleep(0.5)
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(port, seconds, results))
+                   for _ in range(workers + 1)]
+        started = time.perf_counter()
+        for process in clients:
+            process.start()
+        if hup:
+            time.sleep(seconds / 2)
+            server.send_signal(signal.SIGHUP)
+        totals = [results.get() for _ in clients]
+        elapsed = time.perf_counter() - started
+        for process in clients:
+            process.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    ok = sum(result[0] for result in totals)
+    failed = sum(result[1] for result in totals)
+    return ok / elapsed, failed
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count()
+
+    counts = []
+    count = 1
+    while count < max_workers:
+        counts.append(count)
+        count *= 2
+    counts.append(max_workers)
+
+    print(f"{'workers':>8} {'req/s':>9} {'speedup':>8} {'failed':>7}")
+    baseline = None
+    for workers in counts:
+        rate, failed = run(workers, seconds)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>9.0f} {rate / baseline:>7.2f}x {failed:>7}")
+
+    rate, failed = run(max_workers, seconds, max_requests=500, hup=True)
+    print(f"SIGHUP + max_requests=500 with {max_workers} workers: {rate:.0f} req/s, {failed} failed requests")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,161 @@
+"""Notification throughput against a local SMTP stand-in, per-row vs digest pipeline.
+
+Usage: python benchmarks/notifications.py [due_rows ...] [--connect-latency SECONDS]
+
+Seeds a temporary app database with due accounts (five per user) and runs
+"per_row", which mirrors the old check_and_send_notifications (lazy user and
+casino loads, one connection and one email per due row), and "digest", which
+is notifications.send_due_notifications with a DigestSender. The stand-in
+server sleeps --connect-latency before its greeting to model TCP/TLS/AUTH
+setup on a real relay.
+"""
+import argparse
+import os
+import smtplib
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, User, Casino, Account, CoinClaim
+from notifications import DigestSender, send_due_notifications
+
+ACCOUNTS_PER_USER = 5
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Accepts just enough SMTP for smtplib and counts connections and messages"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_latency):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.connect_latency = connect_latency
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connect_latency)
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-stand-in')
+                self.reply('250 8BITMIME')
+            elif command.startswith('DATA'):
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+def seed(due_rows):
+    users = [User(username=f"user{i}", email=f"user{i}@example.com", password_hash="x")
+             for i in range(max(1, due_rows // ACCOUNTS_PER_USER))]
+    db.session.add_all(users)
+    db.session.flush()
+    casinos = [Casino(name=f"Casino {i}", website=f"https://casino{i}.example", user_id=users[0].id)
+               for i in range(5)]
+    db.session.add_all(casinos)
+    db.session.flush()
+    accounts = [Account(username=f"acct{i}", casino_id=casinos[i % 5].id, user_id=users[i // ACCOUNTS_PER_USER].id)
+                for i in range(due_rows)]
+    db.session.add_all(accounts)
+    db.session.flush()
+    # Every account last claimed two days ago, so all of them are due
+    db.session.add_all([CoinClaim(account_id=account.id, claim_time=datetime.now() - timedelta(days=2), amount=100)
+                        for account in accounts])
+    db.session.commit()
+
+def run_per_row(smtp_port):
+    due = Account.query.all()
+    for account in due:
+        user, casino = account.user, account.casino  # lazy loads, one query each
+        message = EmailMessage()
+        message['Subject'] = 'Free Coins Available!'
+        message['From'] = 'noreply@sweeperkeeper.local'
+        message['To'] = user.email
+        message.set_content(f"Hello {user.username}, your free coins are available in {casino.name}!")
+        with smtplib.SMTP('127.0.0.1', smtp_port) as smtp:
+            smtp.send_message(message)
+    return len(due)
+
+def run_digest(app, smtp_port):
+    sender = DigestSender(host='127.0.0.1', port=smtp_port)
+    queued = send_due_notifications(sender, 'http://localhost:5000/dashboard')
+    sender.stop()
+    # A second pass right away must find nothing thanks to last_notified_at
+    again = send_due_notifications(sender, 'http://localhost:5000/dashboard')
+    sender.stop()
+    return queued, again
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('due_rows', nargs='*', type=int, default=[100, 300, 1000])
+    parser.add_argument('--connect-latency', type=float, default=0.005)
+    args = parser.parse_args()
+
+    smtp_server = SMTPStandIn(args.connect_latency)
+    threading.Thread(target=smtp_server.serve_forever, daemon=True).start()
+    smtp_port = smtp_server.server_address[1]
+
+    print(f"{'rows':>6} {'mode':>8} {'seconds':>8} {'rows/s':>9} {'queries':>8} {'smtp conns':>10} {'emails':>7}")
+    for due_rows in args.due_rows:
+        for mode in ("per_row", "digest"):
+            with tempfile.TemporaryDirectory() as tmp:
+                app = Flask(__name__)
+                app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'app.db')}"
+                db.init_app(app)
+                with app.app_context():
+                    db.create_all()
+                    seed(due_rows)
+                    db.session.expire_all()
+
+                    queries = [0]
+                    def count(*_):
+                        queries[0] += 1
+                    event.listen(db.engine, 'before_cursor_execute', count)
+                    connections, messages = smtp_server.connections, smtp_server.messages
+
+                    started = time.perf_counter()
+                    if mode == "per_row":
+                        run_per_row(smtp_port)
+                    else:
+                        queued, again = run_digest(app, smtp_port)
+                        assert again == 0, f"{again} digests re-queued"
+                    elapsed = time.perf_counter() - started
+
+                    event.remove(db.engine, 'before_cursor_execute', count)
+                    db.session.remove()
+                    db.engine.dispose()
+            print(f"{due_rows:>6} {mode:>8} {elapsed:>8.3f} {due_rows / elapsed:>9.0f} {queries[0]:>8} "
+                  f"{smtp_server.connections - connections:>10} {smtp_server.messages - messages:>7}")
+
+    smtp_server.shutdown()
+
+if __name__ == "__main__":
+    main()
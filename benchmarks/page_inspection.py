@@ -0,0 +1,48 @@
+"""Micro-benchmark: streaming selector scan vs. full BeautifulSoup parse.
+
+Usage: python benchmarks/page_inspection.py [captured_page.html ...]
+
+Without arguments it runs against generated claim pages of a few shapes;
+pass saved claim pages to benchmark real markup instead.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_inspector import FullParseInspector, StreamingInspector
+
+SELECTORS = ["#claim-coins-button", "#login-form"]
+
+def generated_pages():
+    filler = ''.join(f'<div class="promo"><a href="/game/{i}">Game {i}</a><p>Spin to win</p></div>' for i in range(400))
+    button = '<button id="claim-coins-button" class="btn">Claim</button>'
+    login = '<form id="login-form"><input name="username"></form>'
+    return {
+        "button near top": f"<html><body>{button}{filler}</body></html>",
+        "button at bottom": f"<html><body>{filler}{button}</body></html>",
+        "login page": f"<html><body>{login}{filler}</body></html>",
+        "no match": f"<html><body>{filler}</body></html>",
+    }
+
+def captured_pages(paths):
+    pages = {}
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+def main():
+    pages = captured_pages(sys.argv[1:]) if len(sys.argv) > 1 else generated_pages()
+    full, streaming = FullParseInspector(), StreamingInspector()
+    print(f"{'page':<24}{'size':>9}{'full ms':>10}{'stream ms':>11}{'speedup':>9}")
+    for name, html in pages.items():
+        assert full.find_first(html, SELECTORS) == streaming.find_first(html, SELECTORS), name
+        runs = 50
+        full_ms = timeit.timeit(lambda: full.find_first(html, SELECTORS), number=runs) / runs * 1000
+        stream_ms = timeit.timeit(lambda: streaming.find_first(html, SELECTORS), number=runs) / runs * 1000
+        print(f"{name:<24}{len(html):>9}{full_ms:>10.3f}{stream_ms:>11.3f}{full_ms / stream_ms:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
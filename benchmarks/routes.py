@@ -0,0 +1,114 @@
+"""Latency of the main per-user routes on a 100k-account database, with and without the lookup indexes.
+
+Usage: python benchmarks/routes.py [users] [accounts_per_user] [requests]
+
+Seeds a temporary SQLite app database (default 1000 users x 100 accounts,
+ten casinos and one claim per account, rollups built from the claims),
+then requests /dashboard and /analytics through the Flask
+test client as a different user each time, so the analytics cache never
+answers. The same requests run again after dropping the indexes added in
+migration a7d3c5e91b20, which is what every per-user lookup cost before.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'app.db')}"
+os.environ['METRICS_PATH'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from sqlalchemy import insert, text
+
+import app as webapp
+from models import db, User, Casino, Account, CoinClaim
+
+CASINOS_PER_USER = 10
+INDEXES = [
+    ('ix_account_user_id_id', 'account'),
+    ('ix_account_casino_id', 'account'),
+    ('ix_casino_user_id_name', 'casino'),
+    ('ix_coin_claim_account_id_claim_time', 'coin_claim'),
+]
+ROUTES = ['/dashboard', '/analytics']
+
+def seed(users, accounts_per_user):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [
+        {'id': u + 1, 'username': f"user{u}", 'email': f"user{u}@example.com", 'password_hash': "x"}
+        for u in range(users)])
+    db.session.execute(insert(Casino), [
+        {'id': u * CASINOS_PER_USER + c + 1, 'name': f"Casino {c}", 'website': f"https://casino{c}.example",
+         'user_id': u + 1}
+        for u in range(users) for c in range(CASINOS_PER_USER)])
+    # Interleave users so one user's rows are spread over the whole table, as they are after months of signups
+    db.session.execute(insert(Account), [
+        {'id': a * users + u + 1, 'username': f"acct{a}", 'user_id': u + 1,
+         'casino_id': u * CASINOS_PER_USER + a % CASINOS_PER_USER + 1}
+        for a in range(accounts_per_user) for u in range(users)])
+    now = datetime.now()
+    db.session.execute(insert(CoinClaim), [
+        {'account_id': account_id, 'claim_time': now - timedelta(hours=account_id % 200), 'amount': 100}
+        for account_id in range(1, users * accounts_per_user + 1)])
+    db.session.execute(text("""
+        INSERT INTO claim_rollup_daily (user_id, casino_id, day, total_amount, successful_claims, total_attempts)
+        SELECT a.user_id, a.casino_id, date(cc.claim_time), SUM(cc.amount), COUNT(*), COUNT(*)
+        FROM coin_claim cc JOIN account a ON cc.account_id = a.id
+        GROUP BY a.user_id, a.casino_id, date(cc.claim_time)
+    """))
+    db.session.commit()
+
+def time_routes(client_for, user_ids):
+    results = {}
+    for route in ROUTES:
+        samples = []
+        for user_id in user_ids:
+            client = client_for(user_id)
+            started = time.perf_counter()
+            response = client.get(route)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, f"{route} returned {response.status_code}"
+        results[route] = statistics.median(samples) * 1000
+    return results
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    accounts_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    logging.disable(logging.WARNING)
+    flask_app = webapp.app
+
+    started = time.perf_counter()
+    with flask_app.app_context():
+        seed(users, accounts_per_user)
+    print(f"seeded {users} users, {users * accounts_per_user} accounts in {time.perf_counter() - started:.1f}s")
+
+    def client_for(user_id):
+        client = flask_app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+        return client
+
+    step = max(1, users // (requests * 2))
+    warm = list(range(1, users + 1, step))[:requests]
+    indexed = time_routes(client_for, warm)
+
+    with flask_app.app_context():
+        for name, _ in INDEXES:
+            db.session.execute(text(f"DROP INDEX {name}"))
+        db.session.commit()
+    # Different users, so neither run benefits from the other's cached analytics
+    unindexed = time_routes(client_for, list(range(2, users + 1, step))[:requests])
+
+    print(f"{'route':>14} {'indexed ms':>11} {'no index ms':>12} {'speedup':>8}")
+    for route in ROUTES:
+        print(f"{route:>14} {indexed[route]:>11.2f} {unindexed[route]:>12.2f} "
+              f"{unindexed[route] / indexed[route]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
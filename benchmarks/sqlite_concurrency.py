@@ -0,0 +1,97 @@
+"""Concurrent read/write throughput on the bot's SQLite file, before and after
+the database.initialize_database performance profile.
+
+Usage: python benchmarks/sqlite_concurrency.py [seconds] [readers]
+
+"baseline" creates the tables only and uses plain sqlite3 connections with the
+default rollback journal; "tuned" goes through initialize_database/connect (WAL,
+pragmas, schema indexes). One writer commits claims row by row, like
+log_coin_claim, while the readers run per-account analytics sums.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+ACCOUNTS = 2000
+SEED_CLAIMS = 200000
+
+def setup(db_path, profile):
+    if profile == "tuned":
+        conn = database.initialize_database(db_path)
+    else:
+        conn = sqlite3.connect(db_path)
+        database.create_tables(conn)
+    conn.execute("INSERT INTO casinos (name, website) VALUES ('Chumba Casino', 'https://www.chumbacasino.com')")
+    conn.executemany("INSERT INTO accounts (casino_id, username) VALUES (1, ?)",
+                     [(f"user{i}",) for i in range(ACCOUNTS)])
+    conn.executemany("INSERT INTO coin_claims (account_id, claim_time, amount) VALUES (?, ?, ?)",
+                     [(random.randint(1, ACCOUNTS), f"2026-0{random.randint(1, 9)}-1{random.randint(0, 9)} 12:00:00", 100)
+                      for _ in range(SEED_CLAIMS)])
+    conn.commit()
+    conn.close()
+
+def open_connection(db_path, profile):
+    if profile == "tuned":
+        return database.connect(db_path)
+    return sqlite3.connect(db_path, timeout=5)
+
+def run(profile, seconds, readers):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        setup(db_path, profile)
+        counts = {"writes": 0, "reads": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def writer():
+            conn = open_connection(db_path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    conn.execute("INSERT INTO coin_claims (account_id, claim_time, amount) VALUES (?, CURRENT_TIMESTAMP, 100)",
+                                 (random.randint(1, ACCOUNTS),))
+                    conn.commit()
+                    key = "writes"
+                except sqlite3.OperationalError:
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+            conn.close()
+
+        def reader():
+            conn = open_connection(db_path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    conn.execute("SELECT SUM(amount) FROM coin_claims WHERE account_id = ? AND claim_time >= '2026-05-01'",
+                                 (random.randint(1, ACCOUNTS),)).fetchone()
+                    key = "reads"
+                except sqlite3.OperationalError:
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {key: value / seconds for key, value in counts.items()}
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{'profile':<10}{'writes/s':>12}{'reads/s':>12}{'errors/s':>12}")
+    for profile in ("baseline", "tuned"):
+        result = run(profile, seconds, readers)
+        print(f"{profile:<10}{result['writes']:>12.1f}{result['reads']:>12.1f}{result['errors']:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 import requests
-from bs4 import BeautifulSoup
+import codecs
 import logging
-from config import SEARCH_API_KEY, SEARCH_ENGINE_ID
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from verify_cache import VerificationCache
+from config import (SEARCH_API_KEY, SEARCH_ENGINE_ID, CASINO_VERIFY_WORKERS, CASINO_VERIFY_DEADLINE,
+                    CASINO_VERIFY_TIMEOUT, CASINO_VERIFY_MAX_BYTES)
 
 # List of known social casino websites
 KNOWN_CASINOS = [
@@ -12,50 +17,174 @@ KNOWN_CASINOS = [
     {"name": "Pulsz Casino", "website": "https://www.pulsz.com"},
 ]
 
-def locate_casinos():
+# Page text that suggests a site is a social casino
+VERIFY_KEYWORDS = ['free coins', 'sweeps coins', 'slots', 'casino games', 'play now']
+
+def locate_casinos(force_refresh=False, cache=None):
+    """Return the verified casinos.
+
+    Search results and verdicts come from the on-disk VerificationCache
+    while they are fresh; force_refresh ignores it and checks every site
+    again.
+    """
     logging.info("Locating social casinos")
+    cache = cache or VerificationCache()
     casinos = KNOWN_CASINOS.copy()
     
     # Use a search engine API to find additional social casino websites
     search_query = "social casino free sweeps coins"
+    found = None if force_refresh else cache.load_search(search_query)
+    if found is None:
+        found = search_casinos(search_query)
+        if found is not None:
+            cache.store_search(search_query, found)
+
+    for casino in found or []:
+        if not any(known['website'] == casino['website'] for known in casinos):
+            casinos.append(casino)
+    
+    verified_casinos = verify_casinos(casinos, cache=cache, force_refresh=force_refresh)
+    
+    logging.info(f"Found {len(verified_casinos)} verified social casinos")
+    return verified_casinos
+
+def search_casinos(search_query):
+    """Return [{name, website}] from the search API, or None if the search failed"""
     search_url = f"https://www.googleapis.com/customsearch/v1?key={SEARCH_API_KEY}&cx={SEARCH_ENGINE_ID}&q={search_query}"
     
     try:
-        response = requests.get(search_url)
+        response = requests.get(search_url, timeout=CASINO_VERIFY_TIMEOUT)
+        if not response.ok:
+            logging.error(f"Search for social casinos failed with HTTP {response.status_code}")
+            return None
         search_results = response.json()
-        
-        for item in search_results.get('items', []):
-            name = item['title']
-            website = item['link']
-            if not any(casino['website'] == website for casino in casinos):
-                casinos.append({
-                    'name': name,
-                    'website': website
-                })
+        # Error and quota bodies have no 'items'; don't let them be cached as "no casinos"
+        if 'items' not in search_results:
+            logging.error(f"Search for social casinos returned no results: {search_results.get('error', search_results)}")
+            return None
+        return [{'name': item['title'], 'website': item['link']} for item in search_results['items']]
     
     except Exception as e:
         logging.error(f"Error searching for social casinos: {str(e)}")
-    
-    # Verify each casino
-    verified_casinos = [casino for casino in casinos if verify_casino(casino['website'])]
-    
-    logging.info(f"Found {len(verified_casinos)} verified social casinos")
-    return verified_casinos
+        return None
+
+def verify_casinos(casinos, max_workers=CASINO_VERIFY_WORKERS, deadline_seconds=CASINO_VERIFY_DEADLINE,
+                   cache=None, force_refresh=False):
+    """Verify casinos concurrently.
+
+    Sites not verified within deadline_seconds keep their last cached
+    verdict, or are dropped if they have none.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(verify_casino, casino['website'], deadline, cache, force_refresh): casino
+               for casino in casinos}
+    done, not_done = wait(futures, timeout=deadline_seconds)
+    # Don't wait for stragglers; their requests give up at the deadline on their own
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    verified = []
+    for future, casino in futures.items():
+        if future in done:
+            if future.result():
+                verified.append(casino)
+            continue
+        logging.warning(f"Verification of {casino['website']} did not finish in {deadline_seconds}s")
+        entry = cache.get(casino['website']) if cache else None
+        if entry and entry['verified']:
+            verified.append(casino)
+    return verified
+
+def verify_casino(website, deadline=None, cache=None, force_refresh=False):
+    """Verify if the website is actually a social casino.
+
+    Streams the page and stops reading as soon as a keyword shows up in its
+    text, after CASINO_VERIFY_MAX_BYTES, or at the monotonic deadline. With
+    a cache, a fresh verdict is returned without a request and a stale one
+    is revalidated with If-None-Match / If-Modified-Since. Only pages served
+    with a 2xx status are judged and cached; an error or bot-challenge page
+    says nothing about the site, so it keeps its last verdict.
+    """
+    entry = cache.get(website) if cache and not force_refresh else None
+    if entry and entry['fresh']:
+        return entry['verified']
+
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
 
-def verify_casino(website):
-    """Verify if the website is actually a social casino"""
     try:
-        response = requests.get(website, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Look for keywords that suggest it's a social casino
-        keywords = ['free coins', 'sweeps coins', 'slots', 'casino games', 'play now']
-        text_content = soup.get_text().lower()
-        
-        if any(keyword in text_content for keyword in keywords):
-            return True
-        
+        timeout = CASINO_VERIFY_TIMEOUT
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.monotonic(), 0.1))
+        with requests.get(website, timeout=timeout, stream=True, headers=headers) as response:
+            if response.status_code == 304 and entry:
+                cache.touch(website)
+                return entry['verified']
+
+            if not response.ok:
+                logging.warning(f"HTTP {response.status_code} while verifying casino {website}")
+            else:
+                verified, conclusive = _scan_response(response, deadline)
+                if conclusive:
+                    if cache:
+                        cache.store(website, verified, response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified'))
+                    return verified
+                logging.warning(f"Deadline reached while verifying casino {website}")
+
     except Exception as e:
         logging.error(f"Error verifying casino {website}: {str(e)}")
     
-    return False
+    # A site that is briefly unreachable, erroring or slow keeps its last known verdict
+    if entry is None and cache and force_refresh:
+        entry = cache.get(website)
+    return entry['verified'] if entry else False
+
+def _scan_response(response, deadline):
+    """Return (keyword found, whether the answer is final rather than cut off by the deadline)"""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    scanner = _KeywordScanner(VERIFY_KEYWORDS)
+    received = 0
+    for chunk in response.iter_content(chunk_size=8192):
+        scanner.feed(decoder.decode(chunk))
+        if scanner.matched:
+            return True, True
+        received += len(chunk)
+        if received >= CASINO_VERIFY_MAX_BYTES:
+            return False, True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False, False
+    scanner.feed(decoder.decode(b'', final=True))
+    scanner.close()
+    return scanner.matched, True
+
+class _KeywordScanner(HTMLParser):
+    """Looks for keywords in page text (not markup, scripts or styles) as it is fed"""
+
+    def __init__(self, keywords):
+        super().__init__()
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.overlap = max(len(keyword) for keyword in self.keywords) - 1
+        self.tail = ''
+        self.skip_depth = 0
+        self.matched = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.matched or self.skip_depth:
+            return
+        # Keep the end of the previous text so keywords split across chunks still match
+        text = self.tail + data.lower()
+        if any(keyword in text for keyword in self.keywords):
+            self.matched = True
+        self.tail = text[-self.overlap:] if self.overlap else ''
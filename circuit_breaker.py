@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from config import (CLAIM_MAX_RETRIES, CLAIM_RETRY_BASE_DELAY, CLAIM_RETRY_MAX_DELAY,
+                    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_PROBE_TIMEOUT)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Stops sending claims to a casino that keeps failing.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() refuses every call for reset_timeout seconds. Then it lets a
+    single probe through (half-open): success closes it again, failure
+    reopens it for another reset_timeout. A probe that reports neither
+    within probe_timeout is given up on and another probe is let through.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT,
+                 probe_timeout=BREAKER_PROBE_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_started_at = now
+                logging.info(f"Circuit for {self.name} half-open, sending a probe claim")
+                return True
+            if self.state == HALF_OPEN and now - self.probe_started_at >= self.probe_timeout:
+                self.probe_started_at = now
+                logging.warning(f"Probe claim for {self.name} never reported back, sending another")
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                logging.warning(f"Circuit for {self.name} open after {self.failures} failures, "
+                                f"skipping its claims for {self.reset_timeout}s")
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "short_circuited": self.short_circuited}
+
+def backoff_delay(attempt, base_delay=CLAIM_RETRY_BASE_DELAY, max_delay=CLAIM_RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def call_with_retries(func, retry_on, max_retries=CLAIM_MAX_RETRIES, description="call"):
+    """Run func(), retrying up to max_retries times on the retry_on exceptions"""
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logging.info(f"Transient error in {description} ({str(e)}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+async def call_with_retries_async(func, retry_on, max_retries=CLAIM_MAX_RETRIES, description="call"):
+    """call_with_retries for a coroutine function; sleeps without blocking the event loop"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await func()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logging.info(f"Transient error in {description} ({str(e)}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,74 @@
+import heapq
+import threading
+from datetime import datetime
+
+def parse_reminder(value):
+    """accounts.next_reminder as a datetime, or None if unset or unreadable"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+class ClaimQueue:
+    """Min-heap of (due_time, account_id) for accounts with auto_claim set.
+
+    Rescheduling or removing an account leaves its old heap entry behind;
+    pop_due() and next_due() skip entries whose time no longer matches the
+    account's current due time.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._due)
+
+    def load(self, accounts, now=None, exclude=()):
+        """Rebuild from AccountRecords; accounts without a reminder are due now"""
+        now = now or datetime.now()
+        due = {}
+        for account in accounts:
+            if not account.auto_claim or account.id in exclude:
+                continue
+            due[account.id] = parse_reminder(account.next_reminder) or now
+        with self._lock:
+            self._due = due
+            self._heap = [(due_time, account_id) for account_id, due_time in due.items()]
+            heapq.heapify(self._heap)
+
+    def schedule(self, account_id, due_time):
+        with self._lock:
+            self._due[account_id] = due_time
+            heapq.heappush(self._heap, (due_time, account_id))
+
+    def remove(self, account_id):
+        with self._lock:
+            self._due.pop(account_id, None)
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        """Earliest due time, or None when nothing is scheduled"""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return the ids of every account due at or before now"""
+        now = now or datetime.now()
+        account_ids = []
+        with self._lock:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, account_id = heapq.heappop(self._heap)
+                del self._due[account_id]
+                account_ids.append(account_id)
+                self._drop_stale()
+        return account_ids
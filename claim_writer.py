@@ -0,0 +1,135 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import connect, log_coin_claims
+from config import (CLAIM_WRITER_BATCH_SIZE, CLAIM_WRITER_FLUSH_INTERVAL_MS, CLAIM_WRITER_MAX_ATTEMPTS,
+                    CLAIM_WRITER_RETRY_DELAY_MS)
+
+_STOP = object()
+
+class ClaimResultWriter:
+    """Buffers claim results and writes them to coin_claims in batches.
+
+    Claim workers call record(), which only enqueues. A single writer thread
+    owns the SQLite connection and inserts up to batch_size rows per
+    transaction, or whatever arrived within flush_interval_ms of the first
+    queued row. A batch that fails (e.g. database is locked) is retried
+    with backoff up to max_attempts times before its rows are dropped and
+    logged one by one. stop() (also run at interpreter exit) drains the
+    queue.
+    """
+
+    def __init__(self, db_path='sweeper_keeper.db', batch_size=CLAIM_WRITER_BATCH_SIZE,
+                 flush_interval_ms=CLAIM_WRITER_FLUSH_INTERVAL_MS, max_attempts=CLAIM_WRITER_MAX_ATTEMPTS,
+                 retry_delay_ms=CLAIM_WRITER_RETRY_DELAY_MS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay_ms / 1000
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.retried_flushes = 0
+        self.dropped_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        atexit.register(self.stop)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="claim-writer", daemon=True)
+            self._thread.start()
+
+    def record(self, account_id, amount, claim_time=None):
+        if not self._thread:
+            self.start()
+        claim_time = claim_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.queue.put((account_id, claim_time, amount))
+
+    def stop(self):
+        """Flush everything queued so far and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "rows_written": self.rows_written,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "retried_flushes": self.retried_flushes,
+                "dropped_rows": self.dropped_rows,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._flush(conn, batch)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, batch):
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                log_coin_claims(conn, batch)
+                break
+            except sqlite3.Error as e:
+                if attempt == self.max_attempts:
+                    logging.error(f"Failed to write {len(batch)} claim results after {attempt} attempts: {str(e)}")
+                    for account_id, claim_time, amount in batch:
+                        logging.error(f"Dropped claim result: account {account_id}, {claim_time}, amount {amount}")
+                    with self._lock:
+                        self.failed_flushes += 1
+                        self.dropped_rows += len(batch)
+                    return
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logging.warning(f"Failed to write {len(batch)} claim results ({str(e)}), retrying in {delay:.2f}s")
+                with self._lock:
+                    self.retried_flushes += 1
+                time.sleep(delay)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.rows_written += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
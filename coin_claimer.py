@@ -1,15 +1,94 @@
 import logging
 import requests
-from bs4 import BeautifulSoup
-from database import get_accounts
+from database import get_accounts, on_accounts_changed, thread_local_connection
 from casino_locator import KNOWN_CASINOS
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-import sqlite3
+from config import CLAIM_BACKEND, CLAIM_AMOUNT
+from session_pool import SessionPool
+from auth_cache import AuthSessionCache, restore_cookies
+from urllib.parse import urlsplit
+from page_inspector import get_page_inspector
+from account_cache import AccountCache
+from claim_writer import ClaimResultWriter
+from rate_limit import CasinoLimiter
+from circuit_breaker import CircuitBreaker, call_with_retries
+
+# Claim page and selectors per casino, shared by the threaded handlers and
+# the asyncio engine in async_claimer.
+CLAIM_PAGES = {
+    "Chumba Casino": {
+        "claim_url": "https://www.chumbacasino.com/claim-coins",
+        "login_selector": "#login-form",
+        "claim_selector": "#claim-coins-button",
+    },
+    "LuckyLand Slots": {
+        "claim_url": "https://www.luckylandslots.com/claim-coins",
+        "login_selector": "#login-form",
+        "claim_selector": "#claim-coins-button",
+    },
+    "Global Poker": {
+        "claim_url": "https://www.globalpoker.com/claim-coins",
+        "login_selector": "#login-form",
+        "claim_selector": "#claim-coins-button",
+    },
+    "Funzpoints": {
+        "claim_url": "https://www.funzpoints.com/claim-coins",
+        "login_selector": "#login-form",
+        "claim_selector": "#claim-coins-button",
+    },
+    "Pulsz Casino": {
+        "claim_url": "https://www.pulsz.com/claim-coins",
+        "login_selector": "#login-form",
+        "claim_selector": "#claim-coins-button",
+    },
+}
+
+# Per-casino overrides for the CasinoLimiter that wraps each handler in
+# casino_handlers; anything not set here uses the CASINO_* defaults in config.
+CASINO_LIMITS = {
+    "Chumba Casino": {"rate": 1, "burst": 2, "max_concurrency": 3},
+    "Global Poker": {"latency_target": 8},
+}
+
+# Responses that mean "try again shortly" rather than "this claim failed"
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TransientClaimError(requests.RequestException):
+    """The casino answered with a status in TRANSIENT_STATUS_CODES"""
+
+class ClaimOutcomeUnknown(Exception):
+    """The claim POST timed out, so it may or may not have gone through"""
+
+# Retried with backoff; other errors fail the claim straight away
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, TransientClaimError)
+
+def check_transient(response):
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        raise TransientClaimError(f"HTTP {response.status_code} from {response.url}")
+    return response
+
+def interleave_by_casino(accounts):
+    """Round-robin accounts across casinos so one site's accounts don't run back to back"""
+    by_casino = {}
+    for account in accounts:
+        by_casino.setdefault(account['casino_name'], []).append(account)
+    queues = list(by_casino.values())
+    interleaved = []
+    for index in range(max((len(queue) for queue in queues), default=0)):
+        interleaved.extend(queue[index] for queue in queues if index < len(queue))
+    return interleaved
 
 class CoinClaimer:
-    def __init__(self):
-        self.thread_local = threading.local()
+    def __init__(self, claim_writer=None):
+        self.get_db = thread_local_connection('sweeper_keeper.db')
+        self.session_pool = SessionPool()
+        self.auth_cache = AuthSessionCache()
+        self.page_inspector = get_page_inspector()
+        self.account_cache = AccountCache()
+        on_accounts_changed(self.account_cache.invalidate)
+        # Where claim results are persisted; the bot passes a ClaimResultWriter for
+        # its coin_claims table, the Flask app records its own CoinClaim rows instead
+        self.claim_writer = claim_writer
         self.casino_handlers = {
             "Chumba Casino": self.claim_chumba_casino,
             "LuckyLand Slots": self.claim_luckyland_slots,
@@ -17,11 +96,11 @@ class CoinClaimer:
             "Funzpoints": self.claim_funzpoints,
             "Pulsz Casino": self.claim_pulsz_casino,
         }
-
-    def get_db(self):
-        if not hasattr(self.thread_local, 'db'):
-            self.thread_local.db = sqlite3.connect('sweeper_keeper.db')
-        return self.thread_local.db
+        self.casino_limiters = {
+            name: CasinoLimiter(name, **CASINO_LIMITS.get(name, {}))
+            for name in self.casino_handlers
+        }
+        self.circuit_breakers = {name: CircuitBreaker(name) for name in self.casino_handlers}
 
     def claim_coins(self, account_id):
         logging.info(f"Attempting to claim coins for account {account_id}")
@@ -29,125 +108,200 @@ class CoinClaimer:
         if not account:
             logging.error(f"Account {account_id} not found")
             return False
+        return self._claim_account(account)
 
+    def _claim_account(self, account):
         casino_name = account['casino_name']
         if casino_name in self.casino_handlers:
-            return self.casino_handlers[casino_name](account)
+            success = self.casino_limiters[casino_name].call(self._call_handler, casino_name, account)
+            if success is None:
+                return False
+            self.record_claim_result(account['id'], success)
+            return success
         else:
             logging.error(f"No handler found for casino: {casino_name}")
             return False
 
-    def claim_coins_for_all_accounts(self, max_workers=5):
+    def _call_handler(self, casino_name, account):
+        """Run the casino's handler, or return None if its circuit is open.
+
+        Called inside the casino's limiter, so claims that were queued behind
+        it see the failures recorded by the claims ahead of them.
+        """
+        if not self.circuit_breakers[casino_name].allow():
+            logging.warning(f"Skipping account {account['id']}: circuit for {casino_name} is open")
+            self.casino_limiters[casino_name].mark_skipped()
+            return None
+        return self.casino_handlers[casino_name](account)
+
+    def record_claim_result(self, account_id, success):
+        """Queue the outcome for coin_claims; failed attempts are stored with amount 0"""
+        if self.claim_writer:
+            self.claim_writer.record(account_id, CLAIM_AMOUNT if success else 0)
+
+    def claim_coins_for_all_accounts(self, max_workers=5, backend=None):
         logging.info("Starting claim_coins_for_all_accounts method")
-        accounts = self.get_accounts()
+        # One joined query for the whole sweep instead of one lookup per account
+        accounts = interleave_by_casino(self.account_cache.load_all(self.get_db()).values())
         logging.info(f"Found {len(accounts)} accounts to process")
-        results = []
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_account = {executor.submit(self.claim_coins, account[0]): account for account in accounts}
-            for future in as_completed(future_to_account):
-                account = future_to_account[future]
-                try:
-                    result = future.result()
-                    logging.info(f"Coin claiming for account {account[0]} completed with result: {result}")
-                    results.append((account[0], result))
-                except Exception as exc:
-                    logging.error(f"Account {account[0]} generated an exception: {exc}")
-                    results.append((account[0], False))
+
+        backend = backend or CLAIM_BACKEND
+        if backend == "async":
+            # Imported lazily so the threaded backend works without aiohttp
+            from async_claimer import AsyncClaimEngine
+            results = AsyncClaimEngine(self).run(accounts)
+        else:
+            results = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_account = {executor.submit(self._claim_account, account): account for account in accounts}
+                for future in as_completed(future_to_account):
+                    account = future_to_account[future]
+                    try:
+                        result = future.result()
+                        logging.info(f"Coin claiming for account {account.id} completed with result: {result}")
+                        results.append((account.id, result))
+                    except Exception as exc:
+                        logging.error(f"Account {account.id} generated an exception: {exc}")
+                        results.append((account.id, False))
 
         logging.info(f"claim_coins_for_all_accounts completed. Results: {results}")
+        logging.info(f"Auth session cache: {self.auth_cache.stats()}")
+        if self.claim_writer:
+            logging.info(f"Claim result writer: {self.claim_writer.stats()}")
+        limits = {name: limiter.stats() for name, limiter in self.casino_limiters.items()}
+        logging.info(f"Casino limits: {limits}")
+        breakers = {name: breaker.stats() for name, breaker in self.circuit_breakers.items()}
+        logging.info(f"Circuit breakers: {breakers}")
         return results
 
-    def get_session(self):
-        if not hasattr(self.thread_local, "session"):
-            self.thread_local.session = requests.Session()
-        return self.thread_local.session
+    def get_session(self, account, claim_url):
+        return self.session_pool.get(claim_url, account['id'])
 
     def claim_chumba_casino(self, account):
         logging.info(f"Claiming coins for Chumba Casino account: {account['id']}")
-        return self._generic_claim(account, "https://www.chumbacasino.com/claim-coins", 
-                                   login_selector="#login-form", 
-                                   claim_selector="#claim-coins-button")
+        return self._generic_claim(account, **CLAIM_PAGES["Chumba Casino"])
 
     def claim_luckyland_slots(self, account):
         logging.info(f"Claiming coins for LuckyLand Slots account: {account['id']}")
-        return self._generic_claim(account, "https://www.luckylandslots.com/claim-coins", 
-                                   login_selector="#login-form", 
-                                   claim_selector="#claim-coins-button")
+        return self._generic_claim(account, **CLAIM_PAGES["LuckyLand Slots"])
 
     def claim_global_poker(self, account):
         logging.info(f"Claiming coins for Global Poker account: {account['id']}")
-        return self._generic_claim(account, "https://www.globalpoker.com/claim-coins", 
-                                   login_selector="#login-form", 
-                                   claim_selector="#claim-coins-button")
+        return self._generic_claim(account, **CLAIM_PAGES["Global Poker"])
 
     def claim_funzpoints(self, account):
         logging.info(f"Claiming coins for Funzpoints account: {account['id']}")
-        return self._generic_claim(account, "https://www.funzpoints.com/claim-coins", 
-                                   login_selector="#login-form", 
-                                   claim_selector="#claim-coins-button")
+        return self._generic_claim(account, **CLAIM_PAGES["Funzpoints"])
 
     def claim_pulsz_casino(self, account):
         logging.info(f"Claiming coins for Pulsz Casino account: {account['id']}")
-        return self._generic_claim(account, "https://www.pulsz.com/claim-coins", 
-                                   login_selector="#login-form", 
-                                   claim_selector="#claim-coins-button")
+        return self._generic_claim(account, **CLAIM_PAGES["Pulsz Casino"])
+
+    def _login(self, pooled, account, claim_url):
+        login_url = f"{account['website']}/login"
+
+        # Simulate login
+        login_data = {"username": account['username'], "password": "placeholder_password"}
+        login_response = check_transient(pooled.session.post(login_url, data=login_data))
+
+        if login_response.status_code != 200:
+            logging.error(f"Failed to login for account {account['id']} on {account['casino_name']}")
+            return False
+        pooled.mark_authenticated()
+        self.auth_cache.store(account['id'], urlsplit(claim_url).netloc, pooled.session.cookies)
+        return True
+
+    def _restore_login(self, pooled, account, claim_url):
+        cookies = self.auth_cache.load(account['id'], urlsplit(claim_url).netloc)
+        if not cookies:
+            return False
+        restore_cookies(pooled.session, cookies)
+        pooled.mark_authenticated()
+        return True
+
+    def _inspect_claim_page(self, response, login_selector, claim_selector):
+        """Return 'claim', 'login' or None depending on what the claim page shows first"""
+        if response.status_code in (401, 403):
+            return 'login'
+        found = self.page_inspector.find_first(response.text, [claim_selector, login_selector])
+        if found == claim_selector:
+            return 'claim'
+        if found == login_selector:
+            return 'login'
+        return None
 
     def _generic_claim(self, account, claim_url, login_selector, claim_selector):
-        try:
-            session = self.get_session()
-            login_url = f"{account['website']}/login"
-
-            # Simulate login
-            login_data = {"username": account['username'], "password": "placeholder_password"}
-            login_response = session.post(login_url, data=login_data)
-            
-            if login_response.status_code != 200:
-                logging.error(f"Failed to login for account {account['id']} on {account['casino_name']}")
-                return False
+        breaker = self.circuit_breakers[account['casino_name']]
+        limiter = self.casino_limiters[account['casino_name']]
 
-            # Simulate claiming coins
-            claim_response = session.get(claim_url)
-            soup = BeautifulSoup(claim_response.text, 'html.parser')
-            
-            claim_button = soup.select_one(claim_selector)
-            if claim_button:
-                claim_result = session.post(claim_url, data={"claim": "true"})
-                if "Coins claimed successfully" in claim_result.text:
-                    logging.info(f"Successfully claimed coins for account {account['id']} on {account['casino_name']}")
-                    return True
-                else:
-                    logging.warning(f"Failed to claim coins for account {account['id']} on {account['casino_name']}")
-                    return False
-            else:
-                logging.warning(f"Claim button not found for account {account['id']} on {account['casino_name']}")
-                return False
+        def attempt():
+            try:
+                return self._attempt_claim(account, claim_url, login_selector, claim_selector)
+            except (ClaimOutcomeUnknown,) + TRANSIENT_ERRORS:
+                # Throttled, 5xx or unreachable: shrink the casino's concurrency even if a retry succeeds
+                limiter.mark_congested()
+                raise
 
+        try:
+            result = call_with_retries(
+                attempt, TRANSIENT_ERRORS,
+                description=f"claim for account {account['id']} on {account['casino_name']}")
+            breaker.record_success()
+            return result
+
+        except ClaimOutcomeUnknown as e:
+            breaker.record_failure()
+            logging.error(f"Claim for account {account['id']} on {account['casino_name']} timed out; not repeating it: {str(e)}")
+            return False
         except requests.RequestException as e:
+            breaker.record_failure()
             logging.error(f"Network error while claiming coins for account {account['id']} on {account['casino_name']}: {str(e)}")
             return False
         except Exception as e:
+            breaker.record_failure()
             logging.error(f"Unexpected error claiming coins for account {account['id']} on {account['casino_name']}: {str(e)}")
             return False
 
+    def _attempt_claim(self, account, claim_url, login_selector, claim_selector):
+        """One pass of login, claim page and claim POST; transient errors propagate"""
+        pooled = self.get_session(account, claim_url)
+        session = pooled.session
+
+        # Try the live or cached login first and only log in when there is none
+        if not pooled.is_authenticated() and not self._restore_login(pooled, account, claim_url):
+            if not self._login(pooled, account, claim_url):
+                return False
+
+        # Simulate claiming coins
+        claim_response = check_transient(session.get(claim_url))
+        page_state = self._inspect_claim_page(claim_response, login_selector, claim_selector)
+
+        if page_state == 'login':
+            logging.info(f"Session expired for account {account['id']} on {account['casino_name']}, logging in again")
+            pooled.mark_logged_out()
+            self.auth_cache.discard(account['id'], urlsplit(claim_url).netloc)
+            if not self._login(pooled, account, claim_url):
+                return False
+            claim_response = check_transient(session.get(claim_url))
+            page_state = self._inspect_claim_page(claim_response, login_selector, claim_selector)
+
+        if page_state == 'claim':
+            try:
+                claim_result = session.post(claim_url, data={"claim": "true"})
+            except requests.Timeout as e:
+                raise ClaimOutcomeUnknown(str(e))
+            if "Coins claimed successfully" in claim_result.text:
+                logging.info(f"Successfully claimed coins for account {account['id']} on {account['casino_name']}")
+                return True
+            else:
+                logging.warning(f"Failed to claim coins for account {account['id']} on {account['casino_name']}")
+                return False
+        else:
+            logging.warning(f"Claim button not found for account {account['id']} on {account['casino_name']}")
+            return False
+
     def get_account(self, account_id):
-        db = self.get_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT accounts.id, casinos.name, casinos.website, accounts.username
-            FROM accounts
-            JOIN casinos ON accounts.casino_id = casinos.id
-            WHERE accounts.id = ?
-        """, (account_id,))
-        result = cursor.fetchone()
-        if result:
-            return {
-                "id": result[0],
-                "casino_name": result[1],
-                "website": result[2],
-                "username": result[3]
-            }
-        return None
+        return self.account_cache.get(self.get_db(), account_id)
 
     def get_accounts(self):
         db = self.get_db()
@@ -159,5 +313,11 @@ class CoinClaimer:
         """)
         return cursor.fetchall()
 
+    def close(self):
+        """Flush pending claim results and release pooled connections"""
+        if self.claim_writer:
+            self.claim_writer.stop()
+        self.session_pool.close()
+
 def setup_coin_claimer():
-    return CoinClaimer()
+    return CoinClaimer(claim_writer=ClaimResultWriter())
@@ -8,6 +8,25 @@ USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 
 # Scheduler settings
 CLAIM_INTERVAL_HOURS = 24
+CLAIM_RETRY_MINUTES = 30  # delay before retrying an auto claim that failed
+SCHEDULER_MAX_WORKERS = 5  # auto claims running at the same time
+
+# Free-coin notification emails (app)
+NOTIFICATION_REPEAT_HOURS = 24  # remind again if a due account is still unclaimed after this long
+
+# Pre-fork load balancer (load_balancer.LoadBalancer)
+LB_MAX_REQUESTS = 10000  # requests a worker serves before it is recycled; 0 disables
+LB_MAX_REQUESTS_JITTER = 1000  # random extra requests so workers don't recycle together
+LB_GRACEFUL_TIMEOUT = 30  # seconds a draining worker gets to finish in-flight requests
+LB_WORKER_CONNECTIONS = 1000  # concurrent connections (greenlets) per worker
+LB_BACKLOG = 2048  # listen backlog of the shared socket
+LB_SCALE_INTERVAL = 10  # seconds between scaling decisions
+LB_TELEMETRY_INTERVAL = 1  # seconds between per-worker samples
+LB_TELEMETRY_WINDOW = 60  # samples kept per worker
+LB_STATS_PORT = 9191  # JSON worker stats on 127.0.0.1; None disables
+LB_SCALE_UP_CPU = 75  # average worker CPU % that adds a worker
+LB_SCALE_DOWN_CPU = 20  # average worker CPU % that removes one
+LB_MAX_WORKER_RSS_MB = 512  # workers above this are replaced; None disables
 
 # Logging settings
 LOG_FILE = 'casino_bot.log'
@@ -16,3 +35,92 @@ LOG_LEVEL = 'INFO'
 # Search API settings (replace with actual values)
 SEARCH_API_KEY = 'YOUR_SEARCH_API_KEY'
 SEARCH_ENGINE_ID = 'YOUR_SEARCH_ENGINE_ID'
+
+# Casino verification at startup (casino_locator)
+CASINO_VERIFY_WORKERS = 8  # sites fetched at the same time
+CASINO_VERIFY_DEADLINE = 15  # seconds for the whole verification pass
+CASINO_VERIFY_TIMEOUT = 10  # seconds per site
+CASINO_VERIFY_MAX_BYTES = 2 * 1024 * 1024  # stop reading a page without keywords after this much
+CASINO_CACHE_PATH = 'casino_cache.db'  # search results and verdicts kept between runs
+CASINO_VERIFY_CACHE_TTL = 24 * 60 * 60  # seconds before a verdict is revalidated
+CASINO_SEARCH_CACHE_TTL = 7 * 24 * 60 * 60  # seconds before the search API is queried again
+
+# Coin claiming settings
+CLAIM_BACKEND = 'threads'  # 'threads' or 'async'
+CLAIM_REQUEST_TIMEOUT = 30  # seconds, per HTTP request
+
+# Async claim engine settings (CLAIM_BACKEND = 'async')
+ASYNC_MAX_CONCURRENCY = 200  # claims in flight across all casinos
+ASYNC_CONNECTIONS_PER_HOST = 25  # pooled keep-alive connections per casino host
+
+# Per-casino rate and concurrency limits (both claim backends); override
+# per casino in coin_claimer.CASINO_LIMITS
+CASINO_RATE_PER_SECOND = 2  # claims started per second, on average
+CASINO_RATE_BURST = 4  # claims that may start back to back
+CASINO_MIN_CONCURRENCY = 1
+CASINO_MAX_CONCURRENCY = 4  # concurrency starts here and backs off under errors or latency
+CASINO_LATENCY_TARGET = 5  # seconds; slower claims count as congestion
+CASINO_BACKOFF_FACTOR = 0.5  # concurrency multiplier on congestion
+
+# Claim retries and per-casino circuit breakers
+CLAIM_MAX_RETRIES = 2  # extra attempts after a connection error, timeout, 429 or 5xx
+CLAIM_RETRY_BASE_DELAY = 0.5  # seconds; backoff doubles per attempt, with full jitter
+CLAIM_RETRY_MAX_DELAY = 8  # seconds
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failed claims before a casino is skipped
+BREAKER_RESET_TIMEOUT = 60  # seconds before a probe claim is let through
+BREAKER_PROBE_TIMEOUT = 120  # seconds a half-open probe may run before another is allowed
+
+# Session pool settings (threaded claim backend)
+SESSION_POOL_MAX_SESSIONS = 1000  # (casino host, account) sessions kept alive
+SESSION_POOL_CONNECTIONS_PER_HOST = 10  # pooled keep-alive connections per casino host
+SESSION_LOGIN_TTL = 30 * 60  # seconds an in-memory login is reused before checking the auth cache
+
+# Authenticated session cache (persists casino login cookies across runs)
+AUTH_CACHE_PATH = 'session_cache.db'
+AUTH_CACHE_TTL = 12 * 60 * 60  # seconds
+
+# Claim page inspection: 'streaming' scans tags and stops at the first match,
+# 'full' always builds a BeautifulSoup tree
+PAGE_INSPECTOR = 'streaming'
+
+# Single-account lookup cache used by CoinClaimer.claim_coins
+ACCOUNT_CACHE_TTL = 60  # seconds
+ACCOUNT_CACHE_SIZE = 256  # accounts
+
+# Coins credited per successful claim
+CLAIM_AMOUNT = 100
+
+# Batched coin_claims writer
+CLAIM_WRITER_BATCH_SIZE = 500  # rows per transaction
+CLAIM_WRITER_FLUSH_INTERVAL_MS = 200  # max time a result waits in the queue
+CLAIM_WRITER_MAX_ATTEMPTS = 5  # tries per batch before its rows are dropped (and logged)
+CLAIM_WRITER_RETRY_DELAY_MS = 100  # wait after the first failed try; doubles each time
+
+# SQLite connection profile (database.connect)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_CACHE_SIZE_KB = 64 * 1024  # page cache per connection
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the file mapped into memory
+
+# Connection pool used by Analytics against the SQLite file
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+DB_STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+
+# Per-user analytics result cache (app)
+ANALYTICS_CACHE_TTL = 10 * 60  # seconds
+ANALYTICS_CACHE_SIZE = 2048  # (user, metric, window) entries per process
+ANALYTICS_CACHE_PATH = 'analytics_cache.db'  # results and invalidations shared by LoadBalancer workers
+
+# Request instrumentation and /metrics (instrumentation.Metrics)
+METRICS_PATH = 'metrics.db'  # totals shared by LoadBalancer workers; None keeps them per process
+METRICS_FLUSH_INTERVAL = 5  # seconds between a worker's writes to METRICS_PATH
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+
+# Dashboard (dashboard.load_dashboard)
+DASHBOARD_PAGE_SIZE = 50  # accounts per page
+
+# Database retries in the app (db_resilience.DBRetryPolicy)
+DB_MAX_RETRIES = 3  # retries of a single operation
+DB_RETRY_BUDGET = 5  # retries shared by all operations in one request
+DB_RETRY_BASE_DELAY = 0.05  # seconds; the first retry does not wait
+DB_RETRY_MAX_DELAY = 1  # seconds
@@ -0,0 +1,43 @@
+from sqlalchemy.orm import contains_eager
+
+from models import Account, Casino
+from config import DASHBOARD_PAGE_SIZE
+
+class DashboardPage:
+    """One page of a user's accounts plus the keyset cursors around it"""
+
+    def __init__(self, casinos, accounts, next_cursor, prev_cursor):
+        self.casinos = casinos
+        self.accounts = accounts
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+def load_dashboard(user_id, after=None, before=None, page_size=DASHBOARD_PAGE_SIZE):
+    """Casinos and one page of accounts for the dashboard in two queries.
+
+    Accounts are loaded together with their casino in a single joined query
+    (the template shows account.casino.name), so the statement count does
+    not grow with the page. Pages are keyed on Account.id: `after` returns
+    the page following that id, `before` the page preceding it. One extra
+    row is fetched to tell whether there is a further page.
+    """
+    casinos = Casino.query.filter_by(user_id=user_id).order_by(Casino.name).all()
+
+    query = (Account.query
+             .join(Account.casino)
+             .options(contains_eager(Account.casino))
+             .filter(Account.user_id == user_id))
+    if before is not None:
+        rows = query.filter(Account.id < before).order_by(Account.id.desc()).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        accounts = rows[:page_size][::-1]
+        prev_cursor = accounts[0].id if has_more else None
+        next_cursor = accounts[-1].id if accounts else None
+    else:
+        query = query.filter(Account.id > after) if after is not None else query
+        rows = query.order_by(Account.id).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        accounts = rows[:page_size]
+        next_cursor = accounts[-1].id if has_more else None
+        prev_cursor = accounts[0].id if accounts and after is not None else None
+    return DashboardPage(casinos, accounts, next_cursor, prev_cursor)
@@ -1,12 +1,112 @@
 import sqlite3
 import logging
+import os
+import threading
+from datetime import datetime
+from rollups import BOT_TABLES, rebuild_statements
+from config import SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
 
-def initialize_database():
-    logging.info("Initializing database")
-    conn = sqlite3.connect('sweeper_keeper.db')
+# Callbacks run after accounts or casinos change, e.g. to drop cached lookups
+_accounts_changed_listeners = []
+
+def on_accounts_changed(callback):
+    _accounts_changed_listeners.append(callback)
+
+def notify_accounts_changed():
+    for callback in _accounts_changed_listeners:
+        callback()
+
+def add_column(table, column, definition):
+    """Upgrade step adding a column unless the table already has it"""
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+# Versioned schema upgrades, tracked in PRAGMA user_version. Each entry runs
+# once, in its own transaction, on databases older than its version. Steps
+# are SQL strings or functions taking the connection.
+SCHEMA_UPGRADES = [
+    (1, "indexes for the claim path and analytics", [
+        # Analytics filters accounts by owner; databases created from the Flask models already have it
+        add_column('accounts', 'user_id', 'INTEGER'),
+        'CREATE INDEX IF NOT EXISTS idx_accounts_casino_id ON accounts (casino_id)',
+        'CREATE INDEX IF NOT EXISTS idx_accounts_user_id ON accounts (user_id, casino_id)',
+        # Covers the per-account time-range sums without touching the table
+        'CREATE INDEX IF NOT EXISTS idx_coin_claims_account_time ON coin_claims (account_id, claim_time, amount)',
+        'CREATE INDEX IF NOT EXISTS idx_coin_claims_claim_time ON coin_claims (claim_time)',
+    ]),
+    (2, "claim rollup tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS claim_rollups_daily (
+            user_id INTEGER NOT NULL,
+            casino_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            total_amount REAL NOT NULL DEFAULT 0,
+            successful_claims INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, casino_id, day)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS claim_rollups_hourly (
+            user_id INTEGER NOT NULL,
+            hour DATETIME NOT NULL,
+            total_amount REAL NOT NULL DEFAULT 0,
+            successful_claims INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, hour)
+        )
+        ''',
+        *rebuild_statements(BOT_TABLES, 'sqlite'),
+    ]),
+    (3, "one casino row per website", [
+        # Point accounts at the oldest row for their casino's website
+        '''
+        UPDATE accounts SET casino_id = (
+            SELECT MIN(survivor.id) FROM casinos survivor
+            JOIN casinos duplicate ON duplicate.website = survivor.website
+            WHERE duplicate.id = accounts.casino_id
+        )
+        WHERE casino_id IN (
+            SELECT id FROM casinos WHERE id NOT IN (SELECT MIN(id) FROM casinos GROUP BY website)
+        )
+        ''',
+        'DELETE FROM casinos WHERE id NOT IN (SELECT MIN(id) FROM casinos GROUP BY website)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_casinos_website ON casinos (website)',
+        # Daily rollups are keyed by casino_id, so merge them under the surviving ids
+        *rebuild_statements(BOT_TABLES, 'sqlite'),
+    ]),
+]
+
+def connect(db_path='sweeper_keeper.db', **kwargs):
+    """Open a connection with the performance pragmas every client should use"""
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, **kwargs)
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def thread_local_connection(db_path):
+    """Return a function that gives each thread its own connect(db_path).
+
+    A forked child opens fresh connections instead of reusing its parent's,
+    which SQLite does not allow.
+    """
+    local = threading.local()
+
+    def get_db():
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = connect(db_path)
+            local.pid = os.getpid()
+        return local.db
+    return get_db
+
+def create_tables(conn):
     cursor = conn.cursor()
-    
-    # Create tables
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS casinos (
             id INTEGER PRIMARY KEY,
@@ -37,16 +137,55 @@ def initialize_database():
     ''')
     
     conn.commit()
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def upgrade_schema(conn):
+    for version, description, statements in SCHEMA_UPGRADES:
+        if version <= schema_version(conn):
+            continue
+        # Take the write lock before re-checking, so a second process starting
+        # at the same time waits for this upgrade and then skips it
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            logging.info(f"Upgrading database schema to version {version}: {description}")
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+def initialize_database(db_path='sweeper_keeper.db'):
+    logging.info("Initializing database")
+    conn = connect(db_path)
+
+    # WAL lets the claim writer, the claimer and analytics readers work on the
+    # file at the same time; the setting is stored in the database itself
+    conn.execute('PRAGMA journal_mode = WAL')
+
+    create_tables(conn)
+    upgrade_schema(conn)
     return conn
 
 def store_casino_info(conn, casinos):
-    cursor = conn.cursor()
-    for casino in casinos:
-        cursor.execute('''
-            INSERT OR REPLACE INTO casinos (name, website)
+    """Insert new casinos and rename existing ones, keyed by website; ids never change"""
+    with conn:
+        conn.executemany('''
+            INSERT INTO casinos (name, website)
             VALUES (?, ?)
-        ''', (casino['name'], casino['website']))
-    conn.commit()
+            ON CONFLICT (website) DO UPDATE SET name = excluded.name
+            WHERE casinos.name != excluded.name
+        ''', [(casino['name'], casino['website']) for casino in casinos])
+    notify_accounts_changed()
     logging.info(f"Stored information for {len(casinos)} casinos")
 
 def store_account_info(conn, casino_id, username, auto_claim=False):
@@ -56,6 +195,7 @@ def store_account_info(conn, casino_id, username, auto_claim=False):
         VALUES (?, ?, ?)
     ''', (casino_id, username, auto_claim))
     conn.commit()
+    notify_accounts_changed()
     logging.info(f"Stored account information for user {username}")
 
 def get_accounts(conn):
@@ -67,15 +207,29 @@ def get_accounts(conn):
     ''')
     return cursor.fetchall()
 
-def log_coin_claim(conn, account_id, amount):
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO coin_claims (account_id, claim_time, amount)
-        VALUES (?, CURRENT_TIMESTAMP, ?)
-    ''', (account_id, amount))
+def set_next_reminder(conn, account_id, reminder_time):
+    conn.execute('UPDATE accounts SET next_reminder = ? WHERE id = ?',
+                 (reminder_time.strftime('%Y-%m-%d %H:%M:%S'), account_id))
     conn.commit()
+
+def log_coin_claim(conn, account_id, amount):
+    claim_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    log_coin_claims(conn, [(account_id, claim_time, amount)])
     logging.info(f"Logged coin claim for account {account_id}: {amount} coins")
 
+def log_coin_claims(conn, claims):
+    """Insert (account_id, claim_time, amount) rows in a single transaction.
+
+    The bot never sets accounts.user_id, so its per-user rollups are not
+    maintained here; rebuild-rollups --sqlite recomputes them on demand.
+    """
+    with conn:
+        conn.executemany('''
+            INSERT INTO coin_claims (account_id, claim_time, amount)
+            VALUES (?, ?, ?)
+        ''', claims)
+    logging.debug(f"Logged {len(claims)} coin claims")
+
 def get_coin_claim_history(conn, account_id):
     cursor = conn.cursor()
     cursor.execute('''
@@ -119,6 +273,7 @@ def add_test_accounts(conn):
             cursor.execute('INSERT INTO accounts (casino_id, username) VALUES (?, ?)', account)
         
         conn.commit()
+        notify_accounts_changed()
         logging.info("Added test accounts to the database")
     else:
         logging.info(f"Database already contains {account_count} accounts. Skipping test account creation.")
@@ -0,0 +1,89 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from database import connect
+from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE
+
+class SQLitePool:
+    """Thread-safe pool of long-lived SQLite connections.
+
+    Connections are created on demand up to size and handed out LIFO, so the
+    warmest connection (schema already parsed, statements already prepared in
+    its statement cache) is reused first. Callers block for up to timeout
+    seconds once every connection is checked out.
+    """
+    dialect = 'sqlite'
+
+    def __init__(self, db_path='sweeper_keeper.db', size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = connect(self.db_path, check_same_thread=False,
+                                   cached_statements=DB_STATEMENT_CACHE_SIZE)
+            if conn is None:
+                conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def execute(self, sql, params=None):
+        """Run a query with :name parameters and return all rows as tuples"""
+        with self.connection() as conn:
+            return conn.execute(sql, params or {}).fetchall()
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+class EnginePool:
+    """Runs the same :name-parameter queries on a SQLAlchemy engine.
+
+    Pooling is left to the engine's own QueuePool; compiled statements are
+    kept so each query string is only turned into a TextClause once.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def _statement(self, sql):
+        statement = self._statements.get(sql)
+        if statement is None:
+            from sqlalchemy import text
+            statement = text(sql)
+            with self._lock:
+                self._statements[sql] = statement
+        return statement
+
+    def execute(self, sql, params=None):
+        """Run a query with :name parameters and return all rows as tuples"""
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(self._statement(sql), params or {})]
+
+    def close(self):
+        self.engine.dispose()
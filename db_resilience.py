@@ -0,0 +1,126 @@
+import logging
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from circuit_breaker import backoff_delay
+from instrumentation import current_endpoint
+from config import DB_MAX_RETRIES, DB_RETRY_BUDGET, DB_RETRY_BASE_DELAY, DB_RETRY_MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATEs after which the connection itself is unusable: class 08
+# (connection exception) plus server shutdown / startup
+DISCONNECT_PGCODES = {'57P01', '57P02', '57P03'}
+DISCONNECT_PGCODE_CLASSES = ('08',)
+# SQLSTATEs where the statement failed but the same work will likely
+# succeed if run again
+TRANSIENT_PGCODES = {
+    '40001',  # serialization_failure
+    '40P01',  # deadlock_detected
+    '55P03',  # lock_not_available
+    '53300',  # too_many_connections
+}
+# Errors that carry no SQLSTATE (the server went away mid-statement, or SQLite)
+DISCONNECT_MESSAGES = (
+    'SSL connection has been closed',
+    'server closed the connection unexpectedly',
+    'terminating connection',
+    'could not connect to server',
+    'connection already closed',
+)
+TRANSIENT_MESSAGES = ('database is locked',)
+
+def error_code(error):
+    """SQLSTATE of a DBAPI error, or None (SQLite, or no server reply at all)"""
+    return getattr(getattr(error, 'orig', error), 'pgcode', None)
+
+def is_disconnect(error):
+    code = error_code(error)
+    if code:
+        return code in DISCONNECT_PGCODES or code.startswith(DISCONNECT_PGCODE_CLASSES)
+    message = str(getattr(error, 'orig', error))
+    return any(text in message for text in DISCONNECT_MESSAGES)
+
+def is_retryable(error):
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated or is_disconnect(error):
+        return True
+    code = error_code(error)
+    if code:
+        return code in TRANSIENT_PGCODES
+    return any(text in str(error.orig) for text in TRANSIENT_MESSAGES)
+
+def install(engine):
+    """Make engine invalidate a pooled connection on every disconnect code above.
+
+    SQLAlchemy only recognizes some disconnects on its own; marking the rest
+    here means the broken connection is discarded immediately and the retry
+    checks out a fresh one instead of failing on the same socket again.
+    """
+    @event.listens_for(engine, 'handle_error')
+    def mark_disconnect(context):
+        if not context.is_disconnect and is_disconnect(context.original_exception):
+            context.is_disconnect = True
+
+class DBRetryPolicy:
+    """Runs database operations, retrying transient errors.
+
+    The session is rolled back after every failure. The first retry runs at
+    once, since the broken connection has already been invalidated and a
+    fresh one is checked out. Later retries back off with full jitter, and
+    under gevent the sleep yields to other greenlets.
+
+    Inside a Flask request all operations share a budget of `budget`
+    retries, so a request that keeps hitting errors fails fast instead of
+    retrying once per query. Retries and exhausted budgets are counted in
+    `metrics` by endpoint and reason.
+    """
+
+    def __init__(self, session, metrics=None, max_retries=DB_MAX_RETRIES, budget=DB_RETRY_BUDGET,
+                 base_delay=DB_RETRY_BASE_DELAY, max_delay=DB_RETRY_MAX_DELAY):
+        self.session = session
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _spend_budget(self):
+        if not has_request_context():
+            return True
+        remaining = g.get('db_retry_budget', self.budget)
+        if remaining <= 0:
+            return False
+        g.db_retry_budget = remaining - 1
+        return True
+
+    def _count(self, name, labels, amount=1):
+        if self.metrics:
+            self.metrics.inc(name, (('endpoint', current_endpoint()),) + labels, amount)
+
+    def run(self, operation):
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except DBAPIError as e:
+                self.session.rollback()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if not self._spend_budget():
+                    logger.warning(f"DB retry budget exhausted on {current_endpoint()}: {str(e.orig)}")
+                    self._count('db_retry_budget_exhausted_total', ())
+                    raise
+                reason = error_code(e) or ('disconnect' if e.connection_invalidated or is_disconnect(e) else 'transient')
+                delay = backoff_delay(attempt - 1, self.base_delay, self.max_delay) if attempt else 0
+                logger.warning(f"Retryable DB error ({reason}) on attempt {attempt + 1}, "
+                               f"retrying in {delay:.2f}s: {str(e.orig)}")
+                self._count('db_retries_total', (('reason', reason),))
+                if delay:
+                    self._count('db_retry_sleep_seconds_total', (), delay)
+                    time.sleep(delay)
+                attempt += 1
@@ -0,0 +1,254 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+from database import thread_local_connection
+from config import METRICS_LATENCY_BUCKETS, METRICS_FLUSH_INTERVAL
+
+# name: (type, help) for every metric family the app exports
+FAMILIES = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'db_queries_total': ('counter', 'SQL statements executed, by endpoint'),
+    'db_query_duration_seconds': ('histogram', 'SQL statement latency by endpoint'),
+    'db_retries_total': ('counter', 'Database operations retried after a transient error, by endpoint and reason'),
+    'db_retry_sleep_seconds_total': ('counter', 'Seconds spent backing off between database retries, by endpoint'),
+    'db_retry_budget_exhausted_total': ('counter', 'Requests that ran out of database retries, by endpoint'),
+    'template_render_duration_seconds': ('histogram', 'Template rendering latency by template'),
+    'claim_duration_seconds': ('histogram', 'CoinClaimer.claim_coins latency by result'),
+}
+
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+def _format_labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels)
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+class MetricsStore:
+    """SQLite file every worker process publishes its totals to.
+
+    Each process owns the rows tagged with its own process key and replaces
+    them on flush; readers sum the rows of all processes. Rows left by
+    workers that have exited are folded into one 'retired' process so
+    counters keep growing across worker restarts without the table growing
+    with them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._get_db = thread_local_connection(self.path)
+        conn = self._get_db()
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS metric_values (
+                process TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                series TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (process, series, labels)
+            )
+        ''')
+        conn.commit()
+
+    def publish(self, process, pid, values):
+        conn = self._get_db()
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO metric_values (process, pid, series, labels, value)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(process, pid, series, labels, value) for (series, labels), value in values.items()])
+
+    def fold_exited(self):
+        """Merge the rows of processes that are no longer running into 'retired'"""
+        conn = self._get_db()
+        pids = [row[0] for row in conn.execute("SELECT DISTINCT pid FROM metric_values WHERE process != 'retired'")]
+        exited = [pid for pid in pids if not _pid_running(pid)]
+        if not exited:
+            return
+        marks = ','.join('?' * len(exited))
+        with conn:
+            conn.execute(f'''
+                INSERT INTO metric_values (process, pid, series, labels, value)
+                SELECT 'retired', 0, series, labels, SUM(value) FROM metric_values
+                WHERE pid IN ({marks}) AND process != 'retired' GROUP BY series, labels
+                ON CONFLICT (process, series, labels) DO UPDATE SET value = value + excluded.value
+            ''', exited)
+            conn.execute(f"DELETE FROM metric_values WHERE pid IN ({marks}) AND process != 'retired'", exited)
+
+    def totals(self):
+        return {(series, labels): value for series, labels, value in self._get_db().execute(
+            'SELECT series, labels, SUM(value) FROM metric_values GROUP BY series, labels')}
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metrics:
+    """Counters and latency histograms rendered in Prometheus text format.
+
+    Updates only touch an in-process dict. With shared_path set, each
+    process publishes its totals to a MetricsStore at most every
+    flush_interval seconds (and right before rendering), and render()
+    reports the sum over all LoadBalancer workers. The process key is
+    re-created after a fork, so workers never report the parent's counts.
+    Counts are published at interpreter exit; a LoadBalancer worker, which
+    skips atexit, passes flush(force=True) as its on_worker_exit hook.
+    """
+
+    def __init__(self, buckets=METRICS_LATENCY_BUCKETS, shared_path=None, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.flush_interval = flush_interval
+        self.shared = MetricsStore(shared_path) if shared_path else None
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._process = None
+        self._last_flush = 0.0
+        if self.shared:
+            atexit.register(self.flush, force=True)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._process = uuid.uuid4().hex
+            self._values = {}
+            if self.shared:
+                self.shared.fold_exited()
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, _format_labels(labels))
+        with self._lock:
+            self._check_fork()
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            self._check_fork()
+            for bound in self.buckets:
+                key = (f'{name}_bucket', _format_labels(labels + (('le', _format_bound(bound)),)))
+                self._values[key] = self._values.get(key, 0) + (seconds <= bound)
+            for series, amount in ((f'{name}_sum', seconds), (f'{name}_count', 1)):
+                key = (series, _format_labels(labels))
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def flush(self, force=False):
+        if not self.shared:
+            return
+        with self._lock:
+            self._check_fork()
+            if not force and time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = time.monotonic()
+            values = dict(self._values)
+        self.shared.publish(self._process, self._pid, values)
+
+    def totals(self):
+        if self.shared:
+            self.flush(force=True)
+            return self.shared.totals()
+        with self._lock:
+            self._check_fork()
+            return dict(self._values)
+
+    def render(self):
+        by_family = {}
+        for (series, labels), value in self.totals().items():
+            family = series
+            for suffix in HISTOGRAM_SUFFIXES:
+                if series.endswith(suffix) and series[:-len(suffix)] in FAMILIES:
+                    family = series[:-len(suffix)]
+            by_family.setdefault(family, []).append((series, labels, value))
+
+        lines = []
+        for family in sorted(by_family):
+            kind, help_text = FAMILIES.get(family, ('untyped', family))
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            for series, labels, value in sorted(by_family[family], key=_series_order):
+                value = int(value) if float(value).is_integer() else value
+                lines.append(f'{series}{{{labels}}} {value}' if labels else f'{series} {value}')
+        return '\n'.join(lines) + '\n'
+
+def _series_order(row):
+    series, labels, _ = row
+    # Keep histogram buckets in ascending le order within a label set
+    base, found, le = labels.rpartition('le="')
+    if found:
+        bound = le.rstrip('"')
+        return series, base, float('inf') if bound == '+Inf' else float(bound)
+    return series, labels, 0.0
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'none'
+
+def instrument_app(app, metrics, engine):
+    """Record request, SQL and template timings for app into metrics"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        endpoint = current_endpoint()
+        status = g.pop('metrics_status', 500)
+        metrics.observe('http_request_duration_seconds', (('endpoint', endpoint),), time.perf_counter() - started)
+        metrics.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', status)))
+        metrics.flush()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_query_started'].pop()
+        labels = (('endpoint', current_endpoint()),)
+        metrics.observe('db_query_duration_seconds', labels, time.perf_counter() - started)
+        metrics.inc('db_queries_total', labels)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_query_timer(context):
+        if context.connection is not None and context.connection.info.get('metrics_query_started'):
+            context.connection.info['metrics_query_started'].pop()
+
+    def start_template_timer(sender, template, context, **extra):
+        g.setdefault('metrics_template_started', []).append(time.perf_counter())
+
+    def record_template(sender, template, context, **extra):
+        started = g.get('metrics_template_started')
+        if started:
+            metrics.observe('template_render_duration_seconds', (('template', template.name),),
+                            time.perf_counter() - started.pop())
+
+    before_render_template.connect(start_template_timer, app, weak=False)
+    template_rendered.connect(record_template, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
@@ -2,13 +2,23 @@ from gevent.pywsgi import WSGIServer
 from gevent import monkey
 monkey.patch_all()  # Patch all blocking operations
 
+import gevent
 import multiprocessing
 import os
 import logging
 import psutil
+import random
+import socket
 import time
+import json
 import signal
 from contextlib import contextmanager
+from gevent.pool import Pool
+
+from telemetry import WorkerTelemetry
+from config import (LB_MAX_REQUESTS, LB_MAX_REQUESTS_JITTER, LB_GRACEFUL_TIMEOUT,
+                    LB_WORKER_CONNECTIONS, LB_BACKLOG, LB_SCALE_INTERVAL, LB_TELEMETRY_INTERVAL,
+                    LB_STATS_PORT, LB_SCALE_UP_CPU, LB_SCALE_DOWN_CPU, LB_MAX_WORKER_RSS_MB)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,39 +35,71 @@ def timeout(seconds):
     finally:
         signal.alarm(0)
 
+class Worker:
+    """Supervisor-side record of one forked worker process"""
+
+    def __init__(self, pid, generation, slot):
+        self.pid = pid
+        self.generation = generation
+        self.slot = slot
+        self.started_at = time.monotonic()
+        self.retire_deadline = None
+
 class LoadBalancer:
-    def __init__(self, app, host='0.0.0.0', port=5000):
+    """Pre-fork supervisor running gevent workers on one shared listening socket"""
+
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=None, max_requests=LB_MAX_REQUESTS,
+                 max_requests_jitter=LB_MAX_REQUESTS_JITTER, graceful_timeout=LB_GRACEFUL_TIMEOUT,
+                 worker_connections=LB_WORKER_CONNECTIONS, stats_port=LB_STATS_PORT, on_worker_exit=None):
         self.app = app
         self.host = host
         self.port = port
-        self.num_workers = self._calculate_workers()
+        self.num_workers = workers or self._calculate_workers()
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.worker_connections = worker_connections
+        self.stats_port = stats_port
+        self.on_worker_exit = on_worker_exit
+        self.listener = None
         self.server = None
-        self.workers = []
+        self.stats_server = None
+        self.max_workers = max(multiprocessing.cpu_count() * 4, self.num_workers)
+        # Room for every worker plus the replacements started during restarts
+        self.telemetry = WorkerTelemetry(slots=self.max_workers * 2 + 2)
+        self.workers = {}
+        self.retiring = {}
+        self.generation = 0
         self.running = True
-        
+        self.restart_requested = False
+        self.last_adjustment = time.monotonic()
+        self.last_sample = 0.0
+
     def _calculate_workers(self):
         """Calculate the optimal number of workers based on CPU cores"""
         cpu_count = multiprocessing.cpu_count()
         return (cpu_count * 2) + 1
-    
+
     def _check_system_resources(self):
-        """Monitor system resources"""
+        """Available memory in MB; never blocks"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            available_memory = memory.available / (1024 * 1024)  # Convert to MB
-            
-            logger.info(f"System Status - CPU: {cpu_percent}%, Memory: {memory_percent}%, Available Memory: {available_memory:.2f}MB")
-            return cpu_percent, memory_percent, available_memory
+            return psutil.virtual_memory().available / (1024 * 1024)
         except Exception as e:
             logger.error(f"Error checking system resources: {str(e)}")
-            return 0, 0, 0
-    
+            return 0
+
     def _adjust_workers(self):
-        """Adjust number of workers based on system load"""
-        cpu_percent, memory_percent, available_memory = self._check_system_resources()
-        
+        """Adjust number of workers based on the workers' own CPU over the telemetry window"""
+        available_memory = self._check_system_resources()
+        stats = [self.telemetry.summary(pid) for pid in self.workers]
+        stats = [worker_stats for worker_stats in stats if worker_stats]
+        if not stats:
+            return
+        worker_cpu = sum(worker_stats["cpu_percent"] for worker_stats in stats) / len(stats)
+        logger.info(f"Workers: {len(stats)}, average CPU: {worker_cpu:.1f}%, "
+                    f"requests/s: {sum(worker_stats['requests_per_sec'] for worker_stats in stats):.1f}, "
+                    f"available memory: {available_memory:.2f}MB")
+
         # Don't scale up if memory is too low (less than 500MB available)
         if available_memory < 500:
             if self.num_workers > multiprocessing.cpu_count():
@@ -65,62 +107,284 @@ class LoadBalancer:
                 logger.warning("Low memory detected, scaling down workers")
             return
 
-        # Scale up if CPU or memory usage is high but we have enough resources
-        if (cpu_percent > 80 or memory_percent > 80) and available_memory > 1000:
-            new_workers = min(self.num_workers + 1, multiprocessing.cpu_count() * 4)
+        # Busy workers: add one while memory allows
+        if worker_cpu > LB_SCALE_UP_CPU and available_memory > 1000:
+            new_workers = min(self.num_workers + 1, self.max_workers)
             if new_workers > self.num_workers:
                 self.num_workers = new_workers
                 logger.info(f"Scaling up to {self.num_workers} workers")
-            
-        # Scale down if resource usage is low
-        elif cpu_percent < 30 and memory_percent < 50:
+
+        # Idle workers: drop one
+        elif worker_cpu < LB_SCALE_DOWN_CPU:
             new_workers = max(self.num_workers - 1, multiprocessing.cpu_count())
             if new_workers < self.num_workers:
                 self.num_workers = new_workers
                 logger.info(f"Scaling down to {self.num_workers} workers")
 
+    def _recycle_bloated_workers(self):
+        """Replace at most one worker whose RSS passed LB_MAX_WORKER_RSS_MB"""
+        if not LB_MAX_WORKER_RSS_MB:
+            return
+        for worker in list(self.workers.values()):
+            worker_stats = self.telemetry.summary(worker.pid)
+            if worker_stats and worker_stats["rss_mb"] > LB_MAX_WORKER_RSS_MB:
+                logger.warning(f"Worker {worker.pid} uses {worker_stats['rss_mb']}MB, replacing it")
+                replacement = self._spawn_worker()
+                if replacement:
+                    self._wait_until_ready(replacement)
+                    self._retire_worker(worker)
+                return
+
+    def stats(self):
+        """Supervisor state and per-worker telemetry, as served by the stats endpoint"""
+        snapshot = self.telemetry.snapshot()
+        def describe(worker, state):
+            return dict(pid=worker.pid, state=state, generation=worker.generation,
+                        uptime_seconds=round(time.monotonic() - worker.started_at, 1),
+                        **(snapshot.get(worker.pid) or {}))
+        return {
+            "target_workers": self.num_workers,
+            "generation": self.generation,
+            "workers": [describe(worker, "serving") for worker in self.workers.values()]
+                       + [describe(worker, "draining") for worker in self.retiring.values()],
+        }
+
+    def _stats_app(self, environ, start_response):
+        body = json.dumps(self.stats()).encode()
+        start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    def _start_stats_server(self):
+        if not self.stats_port:
+            return
+        try:
+            self.stats_server = WSGIServer(('127.0.0.1', self.stats_port), self._stats_app, log=None)
+            self.stats_server.start()
+            logger.info(f"Worker stats on http://127.0.0.1:{self.stats_port}/")
+        except OSError as e:
+            logger.error(f"Could not start stats endpoint on port {self.stats_port}: {str(e)}")
+            self.stats_server = None
+
     def _spawn_worker(self):
-        """Spawn a new worker process"""
-        if not self.server:
+        """Fork a worker that serves on the shared listener"""
+        if not self.listener:
             logger.error("Cannot spawn worker: server not initialized")
             return None
-        
+
+        slot = self.telemetry.assign_slot()
+        if slot is None:
+            logger.error("Cannot spawn worker: no free telemetry slot")
+            return None
         try:
-            process = multiprocessing.Process(target=self._worker_process)
-            process.daemon = True
-            process.start()
-            logger.info(f"Started worker process {process.pid}")
-            return process
-        except Exception as e:
+            pid = os.fork()
+        except OSError as e:
             logger.error(f"Error spawning worker: {str(e)}")
+            self.telemetry.release_slot(slot)
             return None
 
-    def _worker_process(self):
-        """Worker process function"""
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._worker_process(slot)
+            except Exception as e:
+                logger.error(f"Worker process error: {str(e)}")
+                exit_code = 1
+            finally:
+                self._worker_shutdown()
+                os._exit(exit_code)
+
+        worker = Worker(pid, self.generation, slot)
+        self.workers[pid] = worker
+        self.telemetry.register(pid, slot)
+        logger.info(f"Started worker process {pid}")
+        return worker
+
+    def _wait_until_ready(self, worker):
+        """Wait up to graceful_timeout for a new worker to start accepting"""
+        deadline = time.monotonic() + self.graceful_timeout
+        while not self.telemetry.ready[worker.slot] and time.monotonic() < deadline:
+            self._reap_workers()
+            if worker.pid not in self.workers:
+                return False
+            time.sleep(0.05)
+        return bool(self.telemetry.ready[worker.slot])
+
+    def _worker_shutdown(self):
+        """Run on_worker_exit in a worker; it leaves through os._exit, which skips atexit"""
+        if not self.on_worker_exit:
+            return
         try:
-            self.server.serve_forever()
+            self.on_worker_exit()
         except Exception as e:
-            logger.error(f"Worker process error: {str(e)}")
+            logger.error(f"Error in worker {os.getpid()} shutdown hook: {str(e)}")
+
+    def _after_fork(self):
+        """Drop database connections inherited from the supervisor"""
+        sqlalchemy = getattr(self.app, 'extensions', {}).get('sqlalchemy')
+        if sqlalchemy is not None:
+            with self.app.app_context():
+                sqlalchemy.engine.dispose(close=False)
+
+    def _worker_process(self, slot):
+        """Serve on the shared listener until told to stop or max_requests is reached"""
+        # The supervisor owns these; a terminal Ctrl-C reaches the whole process group
+        for signum in (signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if self.stats_server:
+            self.stats_server.close()
+        self._after_fork()
+        requests, in_flight = self.telemetry.requests, self.telemetry.in_flight
+
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        handled = 0
+        stopping = False
+
+        def stop(reason):
+            nonlocal stopping
+            if stopping:
+                return
+            stopping = True
+            logger.info(f"Worker {os.getpid()} stopping: {reason}")
+            self.server.stop(timeout=self.graceful_timeout)
+
+        def counted_app(environ, start_response):
+            nonlocal handled
+            handled += 1
+            requests[slot] = handled
+            if handled == limit:
+                gevent.spawn(stop, f"served {handled} requests")
+
+            def closing_start_response(status, headers, exc_info=None):
+                # Once draining, tell keep-alive clients to reconnect elsewhere
+                if stopping:
+                    headers = [header for header in headers if header[0].lower() != 'connection']
+                    headers.append(('Connection', 'close'))
+                return start_response(status, headers, exc_info)
+
+            in_flight[slot] += 1
+            try:
+                return self.app(environ, closing_start_response)
+            finally:
+                in_flight[slot] -= 1
+
+        self.server = WSGIServer(self.listener, counted_app, log=logger,
+                                 spawn=Pool(self.worker_connections))
+        gevent.signal_handler(signal.SIGTERM, gevent.spawn, stop, "SIGTERM")
+        self.server.start()
+        self.telemetry.ready[slot] = 1
+        self.server.serve_forever()
+
+    def scale_to(self, count):
+        """Spawn or drain workers until count are serving"""
+        count = min(max(1, count), self.max_workers)
+        self.num_workers = count
+        while len(self.workers) < count:
+            if not self._spawn_worker():
+                break
+        if len(self.workers) > count:
+            newest = sorted(self.workers.values(), key=lambda worker: worker.started_at, reverse=True)
+            for worker in newest[:len(self.workers) - count]:
+                self._retire_worker(worker)
+
+    def _retire_worker(self, worker):
+        """Ask a worker to finish in-flight requests and exit"""
+        self.workers.pop(worker.pid, None)
+        worker.retire_deadline = time.monotonic() + self.graceful_timeout + 5
+        self.retiring[worker.pid] = worker
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap_workers(self):
+        """Collect exited workers, replacing any that were not retired on purpose"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            self.telemetry.unregister(pid)
+            if self.retiring.pop(pid, None):
+                logger.info(f"Worker {pid} drained and exited")
+                continue
+            if self.workers.pop(pid, None):
+                if os.waitstatus_to_exitcode(status) == 0:
+                    logger.info(f"Worker {pid} recycled")
+                else:
+                    logger.warning(f"Worker {pid} died with status {os.waitstatus_to_exitcode(status)}")
+
+        # Retired workers that ignore SIGTERM past their deadline are killed
+        now = time.monotonic()
+        for worker in list(self.retiring.values()):
+            if worker.retire_deadline < now:
+                logger.warning(f"Worker {worker.pid} did not drain in time, killing it")
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(worker.pid, None)
+
+    def _rolling_restart(self):
+        """Replace every worker, one at a time, keeping num_workers serving throughout"""
+        self.restart_requested = False
+        self.generation += 1
+        logger.info(f"Rolling restart to generation {self.generation}")
+        for worker in [worker for worker in self.workers.values() if worker.generation < self.generation]:
+            if not self.running:
+                return
+            replacement = self._spawn_worker()
+            if not replacement:
+                return
+            # Keep the old worker accepting until its replacement is
+            if not self._wait_until_ready(replacement):
+                logger.warning(f"Worker {replacement.pid} did not start accepting, stopping the restart")
+                return
+            self._retire_worker(worker)
+            while worker.pid in self.retiring and self.running:
+                self._reap_workers()
+                time.sleep(0.1)
+
+    def _handle_signal(self, signum, frame):
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self.running = False
+        elif signum == signal.SIGHUP:
+            self.restart_requested = True
+        elif signum == signal.SIGTTIN:
+            self.num_workers = min(self.num_workers + 1, self.max_workers)
+        elif signum == signal.SIGTTOU:
+            self.num_workers = max(1, self.num_workers - 1)
 
     def _cleanup_workers(self):
-        """Clean up worker processes"""
+        """Drain all workers, killing any still running after graceful_timeout"""
         logger.info("Cleaning up worker processes")
-        for worker in self.workers:
+        for worker in list(self.workers.values()):
+            self._retire_worker(worker)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.retiring and time.monotonic() < deadline:
+            self._reap_workers()
+            time.sleep(0.1)
+        for pid in list(self.retiring):
             try:
-                if worker and worker.is_alive():
-                    worker.terminate()
-                    worker.join(timeout=5)
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
             except Exception as e:
                 logger.error(f"Error cleaning up worker: {str(e)}")
+        self.retiring.clear()
 
     def _initialize_server(self):
-        """Initialize the WSGI server with retries"""
+        """Bind the shared listening socket with retries"""
         retries = 3
         for attempt in range(retries):
             try:
-                self.server = WSGIServer((self.host, self.port), self.app, log=logger)
                 with timeout(5):  # 5 seconds timeout for binding
-                    self.server.init_socket()
+                    self.listener = socket.create_server((self.host, self.port), backlog=LB_BACKLOG)
+                # Accepted sockets inherit this; without it Nagle plus delayed ACKs
+                # stall keep-alive responses that are written in more than one send
+                self.listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 logger.info(f"Server successfully bound to {self.host}:{self.port}")
                 return True
             except TimeoutError:
@@ -137,34 +401,35 @@ class LoadBalancer:
     def start(self):
         """Start the load balancer with multiple worker processes"""
         logger.info(f"Starting load balancer with {self.num_workers} workers")
-        
+
         try:
             # Initialize the server
             if not self._initialize_server():
                 raise RuntimeError("Failed to initialize server")
-            
+
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                signal.signal(signum, self._handle_signal)
+
             # Create initial worker processes
-            for _ in range(self.num_workers):
-                worker = self._spawn_worker()
-                if worker:
-                    self.workers.append(worker)
-            
-            # Monitor and adjust workers
+            self.scale_to(self.num_workers)
+            self._start_stats_server()
+
+            # Supervise: replace exited workers, apply scaling and restarts
             while self.running:
-                self._adjust_workers()
-                
-                # Check and replace dead workers
-                for i, worker in enumerate(self.workers):
-                    if not worker or not worker.is_alive():
-                        logger.warning(f"Worker {i} is dead, spawning replacement")
-                        if worker:
-                            worker.terminate()
-                        new_worker = self._spawn_worker()
-                        if new_worker:
-                            self.workers[i] = new_worker
-                
-                time.sleep(10)  # Check every 10 seconds
-                
+                self._reap_workers()
+                if self.restart_requested:
+                    self._rolling_restart()
+                if time.monotonic() - self.last_sample >= LB_TELEMETRY_INTERVAL:
+                    self.last_sample = time.monotonic()
+                    self.telemetry.sample()
+                if time.monotonic() - self.last_adjustment >= LB_SCALE_INTERVAL:
+                    self.last_adjustment = time.monotonic()
+                    self._adjust_workers()
+                    self._recycle_bloated_workers()
+                if self.running:
+                    self.scale_to(self.num_workers)
+                time.sleep(0.5)
+
         except KeyboardInterrupt:
             logger.info("Received shutdown signal")
         except Exception as e:
@@ -173,14 +438,16 @@ class LoadBalancer:
         finally:
             self.running = False
             logger.info("Shutting down load balancer")
-            if self.server:
+            if self.stats_server:
+                self.stats_server.stop()
+            self._cleanup_workers()
+            if self.listener:
                 try:
-                    self.server.stop()
+                    self.listener.close()
                 except Exception as e:
-                    logger.error(f"Error stopping server: {str(e)}")
-            self._cleanup_workers()
+                    logger.error(f"Error closing listener: {str(e)}")
 
 if __name__ == '__main__':
-    from app import app
-    load_balancer = LoadBalancer(app)
+    from app import app, metrics
+    load_balancer = LoadBalancer(app, on_worker_exit=lambda: metrics.flush(force=True))
     load_balancer.start()
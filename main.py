@@ -1,3 +1,4 @@
+import argparse
 import logging
 from database import initialize_database, store_casino_info, add_test_accounts
 from user_interface import start_cli
@@ -17,6 +18,11 @@ console_handler.setFormatter(formatter)
 logging.getLogger().addHandler(console_handler)
 
 def main():
+    parser = argparse.ArgumentParser(description="SweeperKeeper")
+    parser.add_argument('--refresh-casinos', action='store_true',
+                        help="ignore cached casino search results and verdicts and check every site again")
+    args = parser.parse_args()
+
     logging.info("Starting SweeperKeeper")
     
     # Initialize database
@@ -26,7 +32,7 @@ def main():
     add_test_accounts(db)
     
     # Locate social casinos
-    casinos = locate_casinos()
+    casinos = locate_casinos(force_refresh=args.refresh_casinos)
     
     # Store casino information in the database
     store_casino_info(db, casinos)
@@ -53,12 +59,16 @@ def main():
         else:
             logging.warning(f"Failed to claim coins for account {account_id}")
     
-    # Setup scheduler for automated tasks
-    scheduler = setup_scheduler(coin_claimer)
+    # Setup scheduler for automated tasks; the accounts just claimed wait for their next reminder
+    scheduler = setup_scheduler(coin_claimer, sweep_results=results)
     
     # Start command-line interface
     start_cli(db, casinos, coin_claimer, scheduler)
 
+    # Let running auto claims finish, then flush buffered claim results
+    scheduler.close()
+    coin_claimer.close()
+
 if __name__ == "__main__":
     try:
         main()
@@ -2,7 +2,7 @@ import click
 import os
 import signal
 import sys
-from app import app
+from app import app, metrics
 import logging
 import time
 import psutil
@@ -29,7 +29,7 @@ def cli():
 
 @cli.command()
 @click.option('--port', default=5000, help='Port to run the server on')
-@click.option('--workers', default=None, help='Number of worker processes')
+@click.option('--workers', default=None, type=int, help='Number of worker processes')
 def runserver(port, workers):
     """Run the application server"""
     # Set up signal handlers
@@ -43,7 +43,8 @@ def runserver(port, workers):
     
     if os.environ.get('FLASK_ENV') == 'production':
         from load_balancer import LoadBalancer
-        load_balancer = LoadBalancer(app, port=port)
+        load_balancer = LoadBalancer(app, port=port, workers=workers,
+                                     on_worker_exit=lambda: metrics.flush(force=True))
         try:
             logger.info(f"Starting production server with load balancer on port {port}")
             load_balancer.start()
@@ -64,5 +65,38 @@ def init_db():
         db.create_all()
         click.echo('Database initialized.')
 
+@cli.command()
+@click.option('--sqlite', 'sqlite_path', default=None,
+              help="Rebuild the bot's SQLite file at this path instead of the app database")
+def rebuild_rollups(sqlite_path):
+    """Backfill or rebuild the claim rollup tables from raw claims"""
+    import rollups
+    if sqlite_path:
+        from database import connect
+        conn = connect(sqlite_path)
+        with conn:
+            rollups.rebuild(rollups.sqlite_executor(conn), rollups.BOT_TABLES, 'sqlite')
+        conn.close()
+    else:
+        with app.app_context():
+            from models import db
+            with db.engine.begin() as conn:
+                rollups.rebuild(rollups.sqlalchemy_executor(conn), rollups.APP_TABLES, db.engine.dialect.name)
+    click.echo('Claim rollups rebuilt.')
+
+@cli.command()
+@click.option('--base-url', default=lambda: os.environ.get('APP_BASE_URL', 'http://localhost:5000'),
+              help='Public URL of the app, used for the dashboard link in emails')
+def send_notifications(base_url):
+    """Email each user one digest of their accounts with coins ready (run hourly)"""
+    from flask import url_for
+    from notifications import DigestSender, send_due_notifications
+    sender = DigestSender.from_config(app.config)
+    with app.test_request_context(base_url=base_url):
+        dashboard_url = url_for('dashboard', _external=True)
+        queued = send_due_notifications(sender, dashboard_url)
+    sender.stop()
+    click.echo(f"Sent {queued} notification digests ({sender.stats()}).")
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,31 @@
+"""Add coin_claim table
+
+Revision ID: 3f8a91c2d7e4
+Revises: 5d2f3496fcd7
+Create Date: 2026-10-18 14:02:41.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a91c2d7e4'
+down_revision = '5d2f3496fcd7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('coin_claim',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('claim_time', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('amount', sa.Float(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['account_id'], ['account.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('coin_claim')
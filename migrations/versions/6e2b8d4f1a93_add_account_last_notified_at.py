@@ -0,0 +1,26 @@
+"""Add account.last_notified_at
+
+Revision ID: 6e2b8d4f1a93
+Revises: 9c41e7b0a2f5
+Create Date: 2026-10-18 16:48:12.530871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2b8d4f1a93'
+down_revision = '9c41e7b0a2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('account', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_notified_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('account', schema=None) as batch_op:
+        batch_op.drop_column('last_notified_at')
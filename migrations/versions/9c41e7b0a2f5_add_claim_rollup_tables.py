@@ -0,0 +1,66 @@
+"""Add claim rollup tables
+
+Revision ID: 9c41e7b0a2f5
+Revises: 3f8a91c2d7e4
+Create Date: 2026-10-18 15:37:09.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41e7b0a2f5'
+down_revision = '3f8a91c2d7e4'
+branch_labels = None
+depends_on = None
+
+BUCKETS = {
+    'sqlite': ("date(cc.claim_time)", "strftime('%Y-%m-%d %H:00:00', cc.claim_time)"),
+    'postgresql': ("CAST(cc.claim_time AS DATE)", "date_trunc('hour', cc.claim_time)"),
+}
+
+
+def upgrade():
+    op.create_table('claim_rollup_daily',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('casino_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('successful_claims', sa.Integer(), nullable=False),
+        sa.Column('total_attempts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['casino_id'], ['casino.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'casino_id', 'day')
+    )
+    op.create_table('claim_rollup_hourly',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('successful_claims', sa.Integer(), nullable=False),
+        sa.Column('total_attempts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'hour')
+    )
+
+    # Backfill from existing claims
+    day_expr, hour_expr = BUCKETS[op.get_bind().dialect.name]
+    op.execute(f"""
+        INSERT INTO claim_rollup_daily (user_id, casino_id, day, total_amount, successful_claims, total_attempts)
+        SELECT a.user_id, a.casino_id, {day_expr}, SUM(cc.amount), COUNT(CASE WHEN cc.amount > 0 THEN 1 END), COUNT(*)
+        FROM coin_claim cc
+        JOIN account a ON cc.account_id = a.id
+        GROUP BY a.user_id, a.casino_id, {day_expr}
+    """)
+    op.execute(f"""
+        INSERT INTO claim_rollup_hourly (user_id, hour, total_amount, successful_claims, total_attempts)
+        SELECT a.user_id, {hour_expr}, SUM(cc.amount), COUNT(CASE WHEN cc.amount > 0 THEN 1 END), COUNT(*)
+        FROM coin_claim cc
+        JOIN account a ON cc.account_id = a.id
+        GROUP BY a.user_id, {hour_expr}
+    """)
+
+
+def downgrade():
+    op.drop_table('claim_rollup_hourly')
+    op.drop_table('claim_rollup_daily')
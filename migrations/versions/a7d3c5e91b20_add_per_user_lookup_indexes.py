@@ -0,0 +1,37 @@
+"""Add per-user lookup indexes
+
+Revision ID: a7d3c5e91b20
+Revises: 6e2b8d4f1a93
+Create Date: 2026-10-18 19:05:41.218334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c5e91b20'
+down_revision = '6e2b8d4f1a93'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_account_user_id_id', 'account', ['user_id', 'id']),
+    ('ix_account_casino_id', 'account', ['casino_id']),
+    ('ix_casino_user_id_name', 'casino', ['user_id', 'name']),
+    ('ix_coin_claim_account_id_claim_time', 'coin_claim', ['account_id', 'claim_time']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY keeps the tables writable on Postgres but
+    # cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
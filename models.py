@@ -11,19 +11,57 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     last_login = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
-    casinos = db.relationship('Casino', backref='user', lazy=True)
-    accounts = db.relationship('Account', backref='user', lazy=True)
+    # Per-user collections can hold thousands of rows: they are queries
+    # (user.accounts.filter(...)), never loaded whole by attribute access
+    casinos = db.relationship('Casino', backref=db.backref('user', lazy='select'), lazy='dynamic')
+    accounts = db.relationship('Account', backref=db.backref('user', lazy='select'), lazy='dynamic')
 
 class Casino(db.Model):
+    __table_args__ = (
+        db.Index('ix_casino_user_id_name', 'user_id', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     website = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
 class Account(db.Model):
+    __table_args__ = (
+        # Keyset pages of a user's accounts (dashboard.load_dashboard)
+        db.Index('ix_account_user_id_id', 'user_id', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
-    casino_id = db.Column(db.Integer, db.ForeignKey('casino.id'), nullable=False)
+    casino_id = db.Column(db.Integer, db.ForeignKey('casino.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    casino = db.relationship('Casino', backref='accounts')
+    casino = db.relationship('Casino', backref=db.backref('accounts', lazy='dynamic'), lazy='select')
     coins = db.Column(db.Integer, default=0)
+    last_notified_at = db.Column(db.DateTime)
+
+class CoinClaim(db.Model):
+    __table_args__ = (
+        # Latest claim per account (notifications) and claim history / windows (analytics)
+        db.Index('ix_coin_claim_account_id_claim_time', 'account_id', 'claim_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    claim_time = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    amount = db.Column(db.Float, nullable=False, default=0)
+
+class ClaimRollupDaily(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    casino_id = db.Column(db.Integer, db.ForeignKey('casino.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    successful_claims = db.Column(db.Integer, nullable=False, default=0)
+    total_attempts = db.Column(db.Integer, nullable=False, default=0)
+
+class ClaimRollupHourly(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    successful_claims = db.Column(db.Integer, nullable=False, default=0)
+    total_attempts = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,218 @@
+import atexit
+import logging
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.orm import contains_eager
+
+from models import db, Account, CoinClaim
+from config import CLAIM_INTERVAL_HOURS, NOTIFICATION_REPEAT_HOURS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+def find_due_accounts(now=None):
+    """Accounts whose coins are ready and whose owner hasn't been told yet.
+
+    An account is due when it has no claim in the last CLAIM_INTERVAL_HOURS.
+    It is skipped if its owner was notified after its latest claim, unless
+    that was more than NOTIFICATION_REPEAT_HOURS ago. One query loads the
+    accounts together with their user and casino.
+    """
+    now = now or datetime.now()
+    last_claims = (db.session.query(CoinClaim.account_id, func.max(CoinClaim.claim_time).label('claim_time'))
+                   .group_by(CoinClaim.account_id)
+                   .subquery())
+    last_claim_time = last_claims.c.claim_time
+    return (Account.query
+            .join(Account.user)
+            .join(Account.casino)
+            .outerjoin(last_claims, last_claims.c.account_id == Account.id)
+            .options(contains_eager(Account.user), contains_eager(Account.casino))
+            .filter(or_(last_claim_time.is_(None),
+                        last_claim_time <= now - timedelta(hours=CLAIM_INTERVAL_HOURS)))
+            .filter(or_(Account.last_notified_at.is_(None),
+                        Account.last_notified_at < last_claim_time,
+                        Account.last_notified_at <= now - timedelta(hours=NOTIFICATION_REPEAT_HOURS)))
+            .order_by(Account.user_id, Account.id)
+            .all())
+
+def build_digests(accounts, dashboard_url, sender):
+    """One EmailMessage per user listing all of their due accounts.
+
+    Returns [(message, [account_id, ...])].
+    """
+    by_user = {}
+    for account in accounts:
+        by_user.setdefault(account.user_id, []).append(account)
+
+    digests = []
+    for user_accounts in by_user.values():
+        user = user_accounts[0].user
+        lines = "\n".join(f"- {account.casino.name} ({account.username})" for account in user_accounts)
+        message = EmailMessage()
+        message['Subject'] = 'Free Coins Available!'
+        message['From'] = sender
+        message['To'] = user.email
+        message.set_content(
+            f"Hello {user.username},\n\nYour free coins are now available for collection in:\n{lines}\n\n"
+            f"Visit your dashboard to collect them: {dashboard_url}\n\nRemember to play responsibly!")
+        digests.append((message, [account.id for account in user_accounts]))
+    return digests
+
+def mark_notified(account_ids, notified_at):
+    Account.query.filter(Account.id.in_(account_ids)).update(
+        {Account.last_notified_at: notified_at}, synchronize_session=False)
+    db.session.commit()
+
+class DigestSender:
+    """Sends notification batches from a background thread.
+
+    Each batch goes out over a single SMTP connection. Once a batch is done,
+    the ids of the accounts whose digest was accepted are marked notified
+    inside an app context. Accounts in a batch that is still queued or
+    sending are skipped by later send_due_notifications() calls.
+    """
+
+    def __init__(self, host='localhost', port=25, username=None, password=None, use_tls=False,
+                 default_sender='noreply@sweeperkeeper.local', timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.default_sender = default_sender
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.pending = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        atexit.register(self.stop)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(host=config.get('MAIL_SERVER', 'localhost'), port=config.get('MAIL_PORT', 25),
+                   username=config.get('MAIL_USERNAME'), password=config.get('MAIL_PASSWORD'),
+                   use_tls=config.get('MAIL_USE_TLS', False),
+                   default_sender=config.get('MAIL_DEFAULT_SENDER') or 'noreply@sweeperkeeper.local')
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="digest-sender", daemon=True)
+            self._thread.start()
+
+    def submit(self, app, digests, notified_at):
+        """Queue [(message, account_ids)]; returns how many digests were queued"""
+        with self._lock:
+            batch = [(message, account_ids) for message, account_ids in digests
+                     if not self.pending.intersection(account_ids)]
+            for _, account_ids in batch:
+                self.pending.update(account_ids)
+        if batch:
+            self.start()
+            self.queue.put((app, batch, notified_at))
+        return len(batch)
+
+    def stop(self):
+        """Send everything queued so far and stop the sender thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {"queue_depth": self.queue.qsize(), "pending_accounts": len(self.pending),
+                    "sent": self.sent, "failed": self.failed}
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            app, batch, notified_at = item
+            try:
+                sent_ids = self._send_batch(batch)
+                if sent_ids:
+                    with app.app_context():
+                        mark_notified(sent_ids, notified_at)
+            except Exception as e:
+                logger.error(f"Error sending notification batch: {str(e)}")
+            finally:
+                with self._lock:
+                    for _, account_ids in batch:
+                        self.pending.difference_update(account_ids)
+
+    def _send_batch(self, batch):
+        started = time.perf_counter()
+        sent_ids = []
+        sent_digests = 0
+        smtp = None
+        try:
+            for message, account_ids in batch:
+                if not message['From']:
+                    message['From'] = self.default_sender
+                for attempt in range(2):
+                    try:
+                        if smtp is None:
+                            smtp = self._connect()
+                        smtp.send_message(message)
+                        sent_ids.extend(account_ids)
+                        sent_digests += 1
+                        with self._lock:
+                            self.sent += 1
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        # Reconnect once if the server dropped the shared connection
+                        smtp = None
+                        if attempt:
+                            raise
+                    except smtplib.SMTPException as e:
+                        logger.error(f"Could not send notification to {message['To']}: {str(e)}")
+                        with self._lock:
+                            self.failed += 1
+                        break
+        except (OSError, smtplib.SMTPException) as e:
+            logger.error(f"SMTP connection failed after {sent_digests} notifications: {str(e)}")
+            with self._lock:
+                self.failed += len(batch) - sent_digests
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except (OSError, smtplib.SMTPException):
+                    smtp.close()
+        logger.info(f"Sent {sent_digests} notification digests in {time.perf_counter() - started:.2f}s")
+        return sent_ids
+
+def send_due_notifications(sender, dashboard_url, now=None):
+    """Find due accounts with one query and queue one digest per user on sender.
+
+    Must run inside an app context. Returns the number of digests queued.
+    """
+    now = now or datetime.now()
+    accounts = find_due_accounts(now)
+    digests = build_digests(accounts, dashboard_url, sender.default_sender)
+    queued = sender.submit(current_app._get_current_object(), digests, now)
+    logger.info(f"Queued {queued} notification digests for {len(accounts)} due accounts")
+    return queued
@@ -0,0 +1,93 @@
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+from config import PAGE_INSPECTOR
+
+# "#id", ".class", "tag", "tag#id" or "tag.class" - anything else needs a full parse
+SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?:(?P<kind>[#.])(?P<name>[\w-]+))?$')
+
+CHUNK_SIZE = 8192
+
+class FullParseInspector:
+    """Builds the whole BeautifulSoup tree and runs select_one per selector"""
+
+    def find_first(self, html, selectors):
+        """Return the selector whose element appears first in html, or None"""
+        if not isinstance(html, str):
+            html = ''.join(html)
+        soup = BeautifulSoup(html, 'html.parser')
+        first, first_position = None, None
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element is None:
+                continue
+            position = (element.sourceline or 0, element.sourcepos or 0)
+            if first_position is None or position < first_position:
+                first, first_position = selector, position
+        return first
+
+class StreamingInspector:
+    """Scans HTML start tags incrementally and stops at the first match.
+
+    Handles simple "#id" / ".class" / "tag" selectors. If any selector is
+    more complex the whole call falls back to a full parse.
+    """
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback or FullParseInspector()
+
+    def find_first(self, html, selectors):
+        """Return the selector whose element appears first in html, or None.
+
+        html may be a string or an iterable of string chunks, e.g. a
+        streamed response body.
+        """
+        matchers = []
+        for selector in selectors:
+            match = SIMPLE_SELECTOR.match(selector.strip())
+            if not selector.strip() or not match:
+                return self.fallback.find_first(html, selectors)
+            matchers.append((selector, match.group('tag'), match.group('kind'), match.group('name')))
+
+        chunks = html
+        if isinstance(html, str):
+            chunks = (html[i:i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+
+        scanner = _StartTagScanner(matchers)
+        try:
+            for chunk in chunks:
+                scanner.feed(chunk)
+            scanner.close()
+        except _Found as found:
+            return found.selector
+        return None
+
+class _Found(Exception):
+    def __init__(self, selector):
+        self.selector = selector
+
+class _StartTagScanner(HTMLParser):
+    def __init__(self, matchers):
+        super().__init__(convert_charrefs=False)
+        self.matchers = matchers
+
+    def handle_starttag(self, tag, attrs):
+        for selector, want_tag, kind, name in self.matchers:
+            if want_tag and want_tag.lower() != tag:
+                continue
+            if kind == '#':
+                if not any(key == 'id' and value == name for key, value in attrs):
+                    continue
+            elif kind == '.':
+                if not any(key == 'class' and value and name in value.split() for key, value in attrs):
+                    continue
+            raise _Found(selector)
+
+    handle_startendtag = handle_starttag
+
+def get_page_inspector(kind=PAGE_INSPECTOR):
+    if kind == 'full':
+        return FullParseInspector()
+    return StreamingInspector()
@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from config import (CASINO_RATE_PER_SECOND, CASINO_RATE_BURST, CASINO_MIN_CONCURRENCY,
+                    CASINO_MAX_CONCURRENCY, CASINO_LATENCY_TARGET, CASINO_BACKOFF_FACTOR)
+
+class TokenBucket:
+    """Allows rate requests per second on average and up to burst at once"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, or return how long to wait for one"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class AIMDController:
+    """Adaptive concurrency limit for one casino.
+
+    Each uncongested response under latency_target raises the limit by
+    1/limit, so it grows by about one per round of requests. Congestion (an
+    error, throttling or a slow response) multiplies it by backoff_factor,
+    at most once per latency_target so a burst of failures from the same
+    round only cuts it once.
+    """
+
+    def __init__(self, name, min_limit, max_limit, latency_target, backoff_factor):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_factor = backoff_factor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.last_backoff = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters = []
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """acquire() for asyncio tasks; waits without blocking the event loop"""
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(waiter)
+            await waiter
+
+    def release(self, latency, congested, skipped=False):
+        """Free a slot; a skipped call (no request sent) leaves the limit alone"""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if skipped:
+                pass
+            elif congested or latency > self.latency_target:
+                if now - self.last_backoff >= self.latency_target:
+                    self.last_backoff = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+                    logging.info(f"Backing off {self.name} to {int(self.limit)} concurrent claims")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+class CasinoLimiter:
+    """Token bucket plus AIMD concurrency limit for one casino.
+
+    Settings default to the CASINO_* values in config; any of rate, burst,
+    min_concurrency, max_concurrency, latency_target and backoff_factor can be
+    overridden per casino. call() serves the threaded claim backend and
+    call_async() the asyncio one; both share the same bucket and limit.
+
+    Only congestion shrinks the limit: an exception from the handler, a
+    mark_congested() call made by the handler (throttling, 5xx, network
+    errors it handled itself) or a response slower than latency_target.
+    A claim that simply fails, e.g. coins already claimed, does not.
+    """
+
+    def __init__(self, name, rate=CASINO_RATE_PER_SECOND, burst=CASINO_RATE_BURST,
+                 min_concurrency=CASINO_MIN_CONCURRENCY, max_concurrency=CASINO_MAX_CONCURRENCY,
+                 latency_target=CASINO_LATENCY_TARGET, backoff_factor=CASINO_BACKOFF_FACTOR):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AIMDController(name, min_concurrency, max_concurrency,
+                                          latency_target, backoff_factor)
+        # Per thread, and per asyncio task, so concurrent calls don't see each other's flag
+        self._congested = contextvars.ContextVar(f"congested_{name}", default=False)
+
+        self._skipped = contextvars.ContextVar(f"skipped_{name}", default=False)
+
+    def mark_congested(self):
+        """Called by the handler running in call() or call_async() when the casino pushed back"""
+        self._congested.set(True)
+
+    def mark_skipped(self):
+        """Called by the handler when it returned without contacting the casino"""
+        self._skipped.set(True)
+
+    def call(self, func, *args):
+        """Run func(*args) within the limits"""
+        self.bucket.acquire()
+        self.concurrency.acquire()
+        self._congested.set(False)
+        self._skipped.set(False)
+        started = time.monotonic()
+        try:
+            return func(*args)
+        except Exception:
+            self._congested.set(True)
+            raise
+        finally:
+            self.concurrency.release(time.monotonic() - started, self._congested.get(), self._skipped.get())
+
+    async def call_async(self, func, *args):
+        """Await func(*args) within the limits"""
+        await self.bucket.acquire_async()
+        await self.concurrency.acquire_async()
+        self._congested.set(False)
+        self._skipped.set(False)
+        started = time.monotonic()
+        try:
+            return await func(*args)
+        except Exception:
+            self._congested.set(True)
+            raise
+        finally:
+            self.concurrency.release(time.monotonic() - started, self._congested.get(), self._skipped.get())
+
+    def stats(self):
+        return {"limit": int(self.concurrency.limit), "in_flight": self.concurrency.in_flight}
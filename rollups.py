@@ -0,0 +1,131 @@
+"""Incremental claim rollups keyed by (user, casino, day) and (user, hour).
+
+Both the bot's SQLite file and the Flask app's database keep the same two
+rollup tables next to their raw claims; only the table names differ. The
+app updates its rollups in the same transaction that writes the claims.
+The bot does not: it never sets accounts.user_id, so there is nothing to
+key them on, and its rollups are only filled by rebuild(), which
+recomputes them from scratch.
+"""
+from datetime import datetime
+
+# Table names in the bot's SQLite file and in the Flask app's models
+BOT_TABLES = {
+    'accounts': 'accounts',
+    'casinos': 'casinos',
+    'coin_claims': 'coin_claims',
+    'rollup_daily': 'claim_rollups_daily',
+    'rollup_hourly': 'claim_rollups_hourly',
+}
+APP_TABLES = {
+    'accounts': 'account',
+    'casinos': 'casino',
+    'coin_claims': 'coin_claim',
+    'rollup_daily': 'claim_rollup_daily',
+    'rollup_hourly': 'claim_rollup_hourly',
+}
+
+# Bucket expressions over raw claims, and casts for bucket keys bound as strings
+DIALECTS = {
+    'sqlite': {
+        'day_expr': "date(cc.claim_time)",
+        'hour_expr': "strftime('%Y-%m-%d %H:00:00', cc.claim_time)",
+        'day_param': ":day",
+        'hour_param': ":hour",
+    },
+    'postgresql': {
+        'day_expr': "CAST(cc.claim_time AS DATE)",
+        'hour_expr': "date_trunc('hour', cc.claim_time)",
+        'day_param': "CAST(:day AS DATE)",
+        'hour_param': "CAST(:hour AS TIMESTAMP)",
+    },
+}
+
+UPSERT_DAILY = """
+    INSERT INTO {rollup_daily} (user_id, casino_id, day, total_amount, successful_claims, total_attempts)
+    SELECT a.user_id, a.casino_id, {day_param}, :amount, :successful, 1
+    FROM {accounts} a
+    WHERE a.id = :account_id AND a.user_id IS NOT NULL AND a.casino_id IS NOT NULL
+    ON CONFLICT (user_id, casino_id, day) DO UPDATE SET
+        total_amount = {rollup_daily}.total_amount + excluded.total_amount,
+        successful_claims = {rollup_daily}.successful_claims + excluded.successful_claims,
+        total_attempts = {rollup_daily}.total_attempts + excluded.total_attempts
+"""
+
+UPSERT_HOURLY = """
+    INSERT INTO {rollup_hourly} (user_id, hour, total_amount, successful_claims, total_attempts)
+    SELECT a.user_id, {hour_param}, :amount, :successful, 1
+    FROM {accounts} a
+    WHERE a.id = :account_id AND a.user_id IS NOT NULL AND a.casino_id IS NOT NULL
+    ON CONFLICT (user_id, hour) DO UPDATE SET
+        total_amount = {rollup_hourly}.total_amount + excluded.total_amount,
+        successful_claims = {rollup_hourly}.successful_claims + excluded.successful_claims,
+        total_attempts = {rollup_hourly}.total_attempts + excluded.total_attempts
+"""
+
+REBUILD_DAILY = """
+    INSERT INTO {rollup_daily} (user_id, casino_id, day, total_amount, successful_claims, total_attempts)
+    SELECT a.user_id, a.casino_id, {day_expr}, SUM(cc.amount), COUNT(CASE WHEN cc.amount > 0 THEN 1 END), COUNT(*)
+    FROM {coin_claims} cc
+    JOIN {accounts} a ON cc.account_id = a.id
+    WHERE a.user_id IS NOT NULL AND a.casino_id IS NOT NULL
+    GROUP BY a.user_id, a.casino_id, {day_expr}
+"""
+
+REBUILD_HOURLY = """
+    INSERT INTO {rollup_hourly} (user_id, hour, total_amount, successful_claims, total_attempts)
+    SELECT a.user_id, {hour_expr}, SUM(cc.amount), COUNT(CASE WHEN cc.amount > 0 THEN 1 END), COUNT(*)
+    FROM {coin_claims} cc
+    JOIN {accounts} a ON cc.account_id = a.id
+    WHERE a.user_id IS NOT NULL AND a.casino_id IS NOT NULL
+    GROUP BY a.user_id, {hour_expr}
+"""
+
+def sqlite_executor(conn):
+    def execute(sql, params=None):
+        if isinstance(params, list):
+            return conn.executemany(sql, params)
+        return conn.execute(sql, params or {})
+    return execute
+
+def sqlalchemy_executor(conn):
+    """Wrap a SQLAlchemy Connection or Session"""
+    from sqlalchemy import text
+    return lambda sql, params=None: conn.execute(text(sql), params or {})
+
+def bucket_params(account_id, claim_time, amount):
+    if isinstance(claim_time, datetime):
+        claim_time = claim_time.strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'account_id': account_id,
+        'day': claim_time[:10],
+        'hour': f"{claim_time[:13]}:00:00",
+        'amount': amount,
+        'successful': 1 if amount > 0 else 0,
+    }
+
+def record_claims(execute, tables, dialect, claims):
+    """Add (account_id, claim_time, amount) claims to both rollups.
+
+    Run it in the transaction that inserts the claims themselves.
+    """
+    params = [bucket_params(*claim) for claim in claims]
+    if not params:
+        return
+    names = dict(tables, **DIALECTS[dialect])
+    execute(UPSERT_DAILY.format(**names), params)
+    execute(UPSERT_HOURLY.format(**names), params)
+
+def rebuild_statements(tables, dialect):
+    names = dict(tables, **DIALECTS[dialect])
+    return [
+        'DELETE FROM {rollup_daily}'.format(**names),
+        'DELETE FROM {rollup_hourly}'.format(**names),
+        REBUILD_DAILY.format(**names),
+        REBUILD_HOURLY.format(**names),
+    ]
+
+def rebuild(execute, tables, dialect):
+    """Recompute both rollups from the raw claims"""
+    for statement in rebuild_statements(tables, dialect):
+        execute(statement)
@@ -1,10 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, login_required, logout_user, current_user
 from urllib.parse import urlparse
-from app import db, login_manager, mail
+from app import db, login_manager
 from models import User, Casino
 from forms import LoginForm, RegistrationForm, AddCasinoForm
-from flask_mail import Message
 from datetime import datetime, timedelta
 
 main = Blueprint('main', __name__)
@@ -89,15 +88,8 @@ def collect(casino_id):
 def responsible_gaming():
     return render_template('responsible_gaming.html')
 
-def send_notification_email(user, casino):
-    msg = Message('Free Coins Available!',
-                  recipients=[user.email])
-    msg.body = f"Hello {user.username},\n\nYour free coins are now available for collection in {casino.name}!\n\nVisit your dashboard to collect them: {url_for('main.dashboard', _external=True)}\n\nRemember to play responsibly!"
-    mail.send(msg)
-
-# Schedule this function to run periodically (e.g., every hour)
-def check_and_send_notifications():
-    now = datetime.utcnow()
-    casinos_due = Casino.query.filter(Casino.next_collection <= now).all()
-    for casino in casinos_due:
-        send_notification_email(casino.user, casino)
+# Schedule this function to run periodically (e.g., every hour); see
+# `python manage.py send-notifications` for the app's version
+def check_and_send_notifications(sender):
+    from notifications import send_due_notifications
+    return send_due_notifications(sender, url_for('main.dashboard', _external=True))
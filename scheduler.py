@@ -1,30 +1,164 @@
 import schedule
-import time
 import threading
 import logging
-from database import get_accounts
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from database import get_accounts, on_accounts_changed, set_next_reminder
+from claim_queue import ClaimQueue
+from config import CLAIM_INTERVAL_HOURS, CLAIM_RETRY_MINUTES, SCHEDULER_MAX_WORKERS
+
+def retry_delay(failures):
+    """CLAIM_RETRY_MINUTES doubled per consecutive failure, capped at CLAIM_INTERVAL_HOURS"""
+    minutes = CLAIM_RETRY_MINUTES * 2 ** min(failures - 1, 16)
+    return timedelta(minutes=min(minutes, CLAIM_INTERVAL_HOURS * 60))
 
 class Scheduler:
-    def __init__(self, coin_claimer):
+    """Runs `schedule` jobs and claims auto_claim accounts as they come due.
+
+    Due times come from accounts.next_reminder and are kept in a ClaimQueue.
+    After each claim the account's next_reminder moves CLAIM_INTERVAL_HOURS
+    ahead and the account is queued again, so claims spread out over the
+    day instead of firing together. Failures are retried after
+    retry_delay(), which doubles with each consecutive failure.
+
+    The loop thread sleeps on a condition variable until the earliest claim
+    or `schedule` job is due. Anything that changes the queue wakes it, so
+    it never polls while idle.
+    """
+
+    def __init__(self, coin_claimer, max_workers=SCHEDULER_MAX_WORKERS):
         self.coin_claimer = coin_claimer
         self.running = False
+        self.thread = None
+        self.claim_queue = ClaimQueue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="auto-claim")
+        self.in_flight = set()
+        self.in_flight_lock = threading.Lock()
+        self.failures = {}
+        self.reload_needed = False
+        self.condition = threading.Condition()
+        on_accounts_changed(self.mark_reload_needed)
 
     def start(self):
-        self.running = True
-        thread = threading.Thread(target=self.run_scheduler)
-        thread.start()
+        with self.condition:
+            if self.thread and self.thread.is_alive():
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self.run_scheduler, name="scheduler")
+            self.thread.start()
 
     def stop(self):
-        self.running = False
+        """Stop the loop thread and wait for it; claims already running carry on"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            thread, self.thread = self.thread, None
+        if thread and thread is not threading.current_thread():
+            thread.join()
+
+    def close(self):
+        """Stop and wait for in-flight claims to finish"""
+        self.stop()
+        self.executor.shutdown(wait=True)
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def add_job(self, job):
+        """Register a `schedule` job, e.g. add_job(schedule.every(10).minutes.do(func))"""
+        self.wake()
+        return job
+
+    def remove_job(self, job):
+        schedule.cancel_job(job)
+        self.wake()
 
     def run_scheduler(self):
-        while self.running:
+        while True:
+            with self.condition:
+                while self.running and not self.reload_needed:
+                    timeout = self.seconds_until_next_job()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
             schedule.run_pending()
-            time.sleep(1)
+            self.dispatch_due_claims()
+
+    def seconds_until_next_job(self):
+        """Seconds until the next claim or `schedule` job, or None if nothing is queued"""
+        deadlines = []
+        next_due = self.claim_queue.next_due()
+        if next_due is not None:
+            deadlines.append((next_due - datetime.now()).total_seconds())
+        if schedule.get_jobs():
+            deadlines.append(schedule.idle_seconds())
+        return max(0, min(deadlines)) if deadlines else None
 
     def schedule_coin_claiming(self):
-        schedule.every().day.at("00:00").do(self.claim_coins_for_all_accounts)
-        logging.info("Scheduled daily coin claiming for all accounts")
+        self.reload_claim_queue()
+        logging.info(f"Scheduled {len(self.claim_queue)} auto-claim accounts by next reminder")
+
+    def mark_reload_needed(self):
+        with self.condition:
+            self.reload_needed = True
+            self.condition.notify_all()
+
+    def reload_claim_queue(self):
+        with self.condition:
+            self.reload_needed = False
+        accounts = self.coin_claimer.account_cache.load_all(self.coin_claimer.get_db()).values()
+        with self.in_flight_lock:
+            in_flight = set(self.in_flight)
+        self.claim_queue.load(accounts, exclude=in_flight)
+
+    def dispatch_due_claims(self):
+        if self.reload_needed:
+            self.reload_claim_queue()
+        for account_id in self.claim_queue.pop_due(datetime.now()):
+            with self.in_flight_lock:
+                self.in_flight.add(account_id)
+            self.executor.submit(self.claim_account, account_id)
+
+    def claim_account(self, account_id):
+        success = False
+        try:
+            success = self.coin_claimer.claim_coins(account_id)
+        except Exception as e:
+            logging.error(f"Scheduled claim for account {account_id} failed: {str(e)}")
+
+        if success:
+            logging.info(f"Successfully claimed coins for account {account_id}")
+        else:
+            logging.warning(f"Failed to claim coins for account {account_id}")
+
+        next_due = self.record_claim(account_id, success)
+        with self.in_flight_lock:
+            self.in_flight.discard(account_id)
+        self.claim_queue.schedule(account_id, next_due)
+        self.wake()
+
+    def record_claim(self, account_id, success):
+        """Store the account's next reminder after a claim and return it"""
+        with self.in_flight_lock:
+            failures = 0 if success else self.failures.get(account_id, 0) + 1
+            if failures:
+                self.failures[account_id] = failures
+            else:
+                self.failures.pop(account_id, None)
+        if success:
+            next_due = datetime.now() + timedelta(hours=CLAIM_INTERVAL_HOURS)
+        else:
+            next_due = datetime.now() + retry_delay(failures)
+            logging.info(f"Retrying account {account_id} after {failures} failed claims at {next_due:%Y-%m-%d %H:%M}")
+
+        try:
+            set_next_reminder(self.coin_claimer.get_db(), account_id, next_due)
+        except Exception as e:
+            logging.error(f"Could not store next reminder for account {account_id}: {str(e)}")
+        return next_due
 
     def claim_coins_for_all_accounts(self):
         results = self.coin_claimer.claim_coins_for_all_accounts()
@@ -33,9 +167,19 @@ class Scheduler:
                 logging.info(f"Successfully claimed coins for account {account_id}")
             else:
                 logging.warning(f"Failed to claim coins for account {account_id}")
+            self.record_claim(account_id, success)
+        self.mark_reload_needed()
+
+def setup_scheduler(coin_claimer, sweep_results=()):
+    """Start a Scheduler.
 
-def setup_scheduler(coin_claimer):
+    sweep_results are the [(account_id, success)] of a sweep that already
+    ran; those accounts move to their next reminder first so the queue
+    doesn't claim them again right away.
+    """
     scheduler = Scheduler(coin_claimer)
+    for account_id, success in sweep_results:
+        scheduler.record_claim(account_id, success)
     scheduler.schedule_coin_claiming()
     scheduler.start()
     return scheduler
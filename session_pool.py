@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import SESSION_POOL_MAX_SESSIONS, SESSION_POOL_CONNECTIONS_PER_HOST, SESSION_LOGIN_TTL
+
+class PooledSession:
+    """A requests.Session bound to one (casino host, account) pair"""
+
+    def __init__(self, session, login_ttl):
+        self.session = session
+        self.login_ttl = login_ttl
+        self.logged_in_at = None
+
+    def is_authenticated(self):
+        return self.logged_in_at is not None and time.monotonic() - self.logged_in_at < self.login_ttl
+
+    def mark_authenticated(self):
+        self.logged_in_at = time.monotonic()
+
+    def mark_logged_out(self):
+        self.logged_in_at = None
+
+class SessionPool:
+    """Bounded LRU of sessions keyed by (casino host, account id).
+
+    Each account keeps its own cookies, while every session for the same host
+    shares one HTTPAdapter, so keep-alive connections (and their TLS state)
+    are reused across accounts and across sweeps. The adapter blocks once
+    connections_per_host sockets are busy instead of opening more.
+    """
+
+    def __init__(self, max_sessions=SESSION_POOL_MAX_SESSIONS,
+                 connections_per_host=SESSION_POOL_CONNECTIONS_PER_HOST,
+                 login_ttl=SESSION_LOGIN_TTL):
+        self.max_sessions = max_sessions
+        self.connections_per_host = connections_per_host
+        self.login_ttl = login_ttl
+        self._sessions = OrderedDict()
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, account_id):
+        """Return the PooledSession for the host of url and account_id"""
+        parts = urlsplit(url)
+        key = (parts.netloc, account_id)
+        with self._lock:
+            pooled = self._sessions.get(key)
+            if pooled:
+                self._sessions.move_to_end(key)
+                return pooled
+
+            session = requests.Session()
+            adapter = self._get_adapter(parts.netloc)
+            session.mount(f"https://{parts.netloc}/", adapter)
+            session.mount(f"http://{parts.netloc}/", adapter)
+            pooled = PooledSession(session, self.login_ttl)
+            self._sessions[key] = pooled
+
+            while len(self._sessions) > self.max_sessions:
+                evicted_key, _ = self._sessions.popitem(last=False)
+                logging.debug(f"Evicted session for account {evicted_key[1]} on {evicted_key[0]}")
+            return pooled
+
+    def _get_adapter(self, host):
+        adapter = self._adapters.get(host)
+        if not adapter:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.connections_per_host, pool_block=True)
+            self._adapters[host] = adapter
+        return adapter
+
+    def discard(self, url, account_id):
+        with self._lock:
+            self._sessions.pop((urlsplit(url).netloc, account_id), None)
+
+    def close(self):
+        """Drop every session and close the pooled connections"""
+        with self._lock:
+            self._sessions.clear()
+            for adapter in self._adapters.values():
+                adapter.close()
+            self._adapters.clear()
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from collections import deque
+
+import psutil
+
+from config import LB_TELEMETRY_WINDOW
+
+class WorkerTelemetry:
+    """Per-worker metrics for the LoadBalancer supervisor.
+
+    Workers count requests served and requests in flight in shared-memory
+    slots that only they write, and set their ready flag once they accept
+    connections. The supervisor calls sample() once per tick;
+    it reads those counters plus RSS, CPU and open connections from psutil
+    without blocking (cpu_percent(interval=None) measures since the last
+    call) and keeps the last window samples per worker in a ring buffer.
+    """
+
+    def __init__(self, slots, window=LB_TELEMETRY_WINDOW):
+        self.window = window
+        self.requests = multiprocessing.RawArray('Q', slots)
+        self.in_flight = multiprocessing.RawArray('l', slots)
+        self.ready = multiprocessing.RawArray('b', slots)
+        self.free_slots = list(range(slots))
+        self.slots = {}
+        self.processes = {}
+        self.samples = {}
+
+    def assign_slot(self):
+        """Reserve and zero a counter slot for a worker about to be forked, or None if all are taken"""
+        if not self.free_slots:
+            return None
+        slot = self.free_slots.pop(0)
+        self.requests[slot] = 0
+        self.in_flight[slot] = 0
+        self.ready[slot] = 0
+        return slot
+
+    def release_slot(self, slot):
+        self.free_slots.append(slot)
+
+    def register(self, pid, slot):
+        self.slots[pid] = slot
+        self.samples[pid] = deque(maxlen=self.window)
+        try:
+            process = psutil.Process(pid)
+            process.cpu_percent(interval=None)  # first call only sets the baseline
+            self.processes[pid] = process
+        except psutil.Error:
+            pass
+
+    def unregister(self, pid):
+        self.processes.pop(pid, None)
+        self.samples.pop(pid, None)
+        slot = self.slots.pop(pid, None)
+        if slot is not None:
+            self.release_slot(slot)
+
+    def _connection_count(self, process):
+        connections = getattr(process, 'net_connections', None) or process.connections
+        return sum(1 for connection in connections(kind='tcp') if connection.status == psutil.CONN_ESTABLISHED)
+
+    def sample(self):
+        now = time.monotonic()
+        for pid, process in list(self.processes.items()):
+            slot = self.slots[pid]
+            try:
+                with process.oneshot():
+                    rss = process.memory_info().rss
+                    cpu = process.cpu_percent(interval=None)
+                    connections = self._connection_count(process)
+            except psutil.Error:
+                continue
+            self.samples[pid].append((now, rss, cpu, connections, self.requests[slot], self.in_flight[slot]))
+
+    def summary(self, pid):
+        """Latest RSS, connections and counters plus window averages for one worker"""
+        samples = self.samples.get(pid)
+        if not samples:
+            return None
+        first, last = samples[0], samples[-1]
+        elapsed = last[0] - first[0]
+        return {
+            "rss_mb": round(last[1] / (1024 * 1024), 1),
+            "max_rss_mb": round(max(sample[1] for sample in samples) / (1024 * 1024), 1),
+            "cpu_percent": round(sum(sample[2] for sample in samples) / len(samples), 1),
+            "connections": last[3],
+            "in_flight": last[5],
+            "requests": last[4],
+            "requests_per_sec": round((last[4] - first[4]) / elapsed, 2) if elapsed > 0 else 0.0,
+            "window_seconds": round(elapsed, 1),
+        }
+
+    def snapshot(self):
+        return {pid: summary for pid in list(self.samples) if (summary := self.summary(pid))}
@@ -1,6 +1,7 @@
 import cmd
 import logging
 from datetime import datetime, timedelta
+from database import notify_accounts_changed, store_casino_info
 
 class SweeperKeeperCLI(cmd.Cmd):
     intro = "Welcome to SweeperKeeper. Type 'help' to list commands."
@@ -22,10 +23,13 @@ class SweeperKeeperCLI(cmd.Cmd):
             return
         
         name, website = args
-        cursor = self.db.cursor()
-        cursor.execute("INSERT INTO casinos (name, website) VALUES (?, ?)", (name, website))
-        self.db.commit()
-        print(f"Added casino: {name}")
+        existing = self.db.execute("SELECT id, name FROM casinos WHERE website = ?", (website,)).fetchone()
+        # Same upsert the locator uses: websites are unique, so a known site is renamed, not duplicated
+        store_casino_info(self.db, [{"name": name, "website": website}])
+        if existing:
+            print(f"Casino already exists (ID: {existing[0]}, Name: {existing[1]}); name set to {name}")
+        else:
+            print(f"Added casino: {name}")
 
     def do_list_casinos(self, arg):
         """List all stored casinos"""
@@ -46,6 +50,7 @@ class SweeperKeeperCLI(cmd.Cmd):
         cursor = self.db.cursor()
         cursor.execute("INSERT INTO accounts (casino_id, username) VALUES (?, ?)", (casino_id, username))
         self.db.commit()
+        notify_accounts_changed()
         print(f"Added account: {username} for casino ID: {casino_id}")
 
     def do_list_accounts(self, arg):
@@ -74,6 +79,7 @@ class SweeperKeeperCLI(cmd.Cmd):
             cursor = self.db.cursor()
             cursor.execute("UPDATE accounts SET next_reminder = ? WHERE id = ?", (reminder_time, account_id))
             self.db.commit()
+            notify_accounts_changed()
             print(f"Reminder set for account ID {account_id} in {hours} hours")
         except ValueError:
             print("Invalid hours value. Please enter a number.")
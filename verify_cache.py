@@ -0,0 +1,82 @@
+import json
+import time
+
+from database import thread_local_connection
+from config import CASINO_CACHE_PATH, CASINO_VERIFY_CACHE_TTL, CASINO_SEARCH_CACHE_TTL
+
+class VerificationCache:
+    """Persists casino search results and per-website verification verdicts.
+
+    A verdict younger than verify_ttl seconds is used as is. An older one
+    keeps its ETag / Last-Modified so casino_locator can revalidate it with
+    a conditional GET instead of downloading the page again.
+    """
+
+    def __init__(self, db_path=CASINO_CACHE_PATH, verify_ttl=CASINO_VERIFY_CACHE_TTL,
+                 search_ttl=CASINO_SEARCH_CACHE_TTL):
+        self.db_path = db_path
+        self.verify_ttl = verify_ttl
+        self.search_ttl = search_ttl
+        self._get_db = thread_local_connection(self.db_path)
+        conn = self._get_db()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS casino_verifications (
+                website TEXT PRIMARY KEY,
+                verified INTEGER NOT NULL,
+                checked_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS casino_searches (
+                query TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def get(self, website):
+        """Return {verified, fresh, etag, last_modified} for website, or None"""
+        row = self._get_db().execute(
+            'SELECT verified, checked_at, etag, last_modified FROM casino_verifications WHERE website = ?',
+            (website,)).fetchone()
+        if not row:
+            return None
+        return {
+            "verified": bool(row[0]),
+            "fresh": row[1] + self.verify_ttl > time.time(),
+            "etag": row[2],
+            "last_modified": row[3],
+        }
+
+    def store(self, website, verified, etag=None, last_modified=None):
+        conn = self._get_db()
+        conn.execute('''
+            INSERT OR REPLACE INTO casino_verifications (website, verified, checked_at, etag, last_modified)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (website, int(verified), time.time(), etag, last_modified))
+        conn.commit()
+
+    def touch(self, website):
+        """Mark a verdict as fresh again after a 304 Not Modified"""
+        conn = self._get_db()
+        conn.execute('UPDATE casino_verifications SET checked_at = ? WHERE website = ?', (time.time(), website))
+        conn.commit()
+
+    def load_search(self, query):
+        """Return the cached [{name, website}] for query, or None if missing or stale"""
+        row = self._get_db().execute(
+            'SELECT results, fetched_at FROM casino_searches WHERE query = ?', (query,)).fetchone()
+        if not row or row[1] + self.search_ttl <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def store_search(self, query, results):
+        conn = self._get_db()
+        conn.execute('''
+            INSERT OR REPLACE INTO casino_searches (query, results, fetched_at)
+            VALUES (?, ?, ?)
+        ''', (query, json.dumps(results), time.time()))
+        conn.commit()